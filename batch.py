@@ -0,0 +1,114 @@
+import itertools
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from models import Board, FullPath
+
+# solutions counted per code at most, like the puzzle bank does
+max_counted_solutions = 1000
+# solver nodes per code, roughly half a minute, enough for most 7x7 puzzles
+max_solver_nodes = 2_000_000
+
+
+@dataclass
+class BatchResult:
+    code: str
+    solvable: bool
+    solutions_count: int
+    shortest_solution: Optional[FullPath]
+    difficulty: float
+    error: Optional[str] = None
+    # the search stopped at max_counted_solutions or the node budget, so
+    # solutions_count is a lower bound and shortest_solution the shortest found
+    partial: bool = False
+
+
+def solve_bounded(board: Board, limit: int, max_nodes: int) -> Tuple[int, Optional[FullPath], bool]:
+    # counts the solutions and keeps the shortest, without holding them all
+    solver = board.get_solver()
+    count = 0
+    shortest = None
+    solutions = solver.solutions(copy=False, max_nodes=max_nodes)
+    for solution in solutions:
+        count += 1
+        if shortest is None or len(solution) < len(shortest):
+            shortest = list(solution)
+        if count == limit:
+            solutions.close()
+            break
+
+    return count, shortest, count == limit or solver.gave_up
+
+
+def solve_chunk(codes: List[str], limit: int = max_counted_solutions,
+                max_nodes: int = max_solver_nodes) -> List[BatchResult]:
+    boards = []
+    results: List[Optional[BatchResult]] = [None] * len(codes)
+
+    for i, code in enumerate(codes):
+        board = Board(1, 1, (0, 0), None)
+        try:
+            board.load_custom_puzzle(code)
+        except Exception as e:
+            results[i] = BatchResult(code, False, 0, None, 0, error=f'cannot decode: {e!r}')
+            continue
+
+        boards.append((i, board))
+
+    # solving the same geometry back to back keeps its topology hot in the cache
+    boards.sort(key=lambda item: (item[1].width, item[1].height, item[1].start, item[1].exit))
+
+    for i, board in boards:
+        count, shortest, partial = solve_bounded(board, limit, max_nodes)
+        board.estimate_difficulty()
+        results[i] = BatchResult(codes[i], count > 0, count, shortest, board.difficulty, partial=partial)
+
+    return results
+
+
+def solve_codes(codes: Iterable[str], workers: int = 0, chunk_size: int = 256,
+                limit: int = max_counted_solutions, max_nodes: int = max_solver_nodes) -> Iterator[BatchResult]:
+    """Solves puzzle codes over a process pool and yields the results in input order.
+    Codes are read lazily and only a few chunks per worker are in flight at once.
+    Every code gets at most `max_nodes` solver nodes and `limit` counted solutions."""
+    workers = workers or os.cpu_count() or 1
+    codes = iter(codes)
+    pending = deque()
+
+    with ProcessPoolExecutor(workers) as executor:
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(itertools.islice(codes, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(solve_chunk, chunk, limit, max_nodes))
+
+            if not pending:
+                return
+
+            yield from pending.popleft().result()
+
+
+def main():
+    # usage: python batch.py codes.txt, one code per line
+    with open(sys.argv[1]) as f:
+        codes = (line.strip() for line in f if line.strip())
+        for result in solve_codes(codes):
+            shortest = len(result.shortest_solution) - 1 if result.shortest_solution else '-'
+            if result.error:
+                status = result.error
+            elif result.solvable:
+                status = 'solvable'
+            else:
+                # out of nodes before finding any solution
+                status = 'undecided' if result.partial else 'unsolvable'
+            count = f'>={result.solutions_count}' if result.partial else result.solutions_count
+            print(f'{result.code}\t{status}\t{count}\t{shortest}\t{result.difficulty:.1f}')
+
+
+if __name__ == '__main__':
+    main()
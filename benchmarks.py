@@ -0,0 +1,590 @@
+import argparse
+import base64
+import contextlib
+import itertools
+import json
+import platform
+import random
+import signal
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import core_config as cfg
+import vectorized
+from bitboard import get_bitboard
+from core_config import EngineConfig
+from encoding import ponchik_encode, ponchik_decode
+from models import Board, PathGenerator, Node, estimate_difficulties
+from path_store import PathStore
+from sampler import LongPathSampler
+
+
+class BenchTimeout(Exception):
+    pass
+
+
+def raise_timeout(_signum, _frame):
+    raise BenchTimeout
+
+
+def count_paths_per_second(paths, duration: float) -> float:
+    # the search can go a long time without finding a path once the exit
+    # is walled off, so the time limit is enforced with a signal
+    count = 0
+    signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, duration)
+    time_start = time.perf_counter()
+
+    try:
+        for _ in paths:
+            count += 1
+    except BenchTimeout:
+        pass
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return count / (time.perf_counter() - time_start)
+
+
+def count_iterative_paths_per_second(pg: PathGenerator, duration: float) -> float:
+    # iter_paths checks the time limit itself, also between paths
+    time_start = time.perf_counter()
+    count = sum(1 for _ in pg.iter_paths(0, time.time() + duration))
+    return count / (time.perf_counter() - time_start)
+
+
+def bench_path_generation(duration: float = 1.0):
+    # the recursive search cannot be stopped without SIGALRM, e.g. on Windows
+    has_alarm = hasattr(signal, 'setitimer')
+    for size in (5, 6, 7):
+        recursive = 0
+        iterative = 0
+        seeds = range(5)
+
+        # the random branch order decides how many dead ends get explored,
+        # so average over a few seeds
+        for seed in seeds:
+            if has_alarm:
+                random.seed(seed)
+                pg = PathGenerator(size, size, (0, 0), (size, size))
+                recursive += count_paths_per_second(pg.dfs_paths(pg.start), duration) / len(seeds)
+
+            random.seed(seed)
+            pg = PathGenerator(size, size, (0, 0), (size, size))
+            iterative += count_iterative_paths_per_second(pg, duration) / len(seeds)
+
+        if has_alarm:
+            print(f'{size}x{size}: recursive {recursive:,.0f} paths/s, '
+                  f'iterative {iterative:,.0f} paths/s ({iterative / recursive:.2f}x)')
+        else:
+            print(f'{size}x{size}: iterative {iterative:,.0f} paths/s (recursive skipped, no SIGALRM here)')
+
+
+def bench_reachability_pruning():
+    layouts = [(3, (0, 0), (3, 3)), (4, (0, 0), (4, 4)), (4, (0, 0), (0, 4)),
+               (4, (2, 2), (4, 4))]
+
+    for size, start, end in layouts:
+        results = []
+        for prune in (False, True):
+            pg = PathGenerator(size, size, start, end)
+            time_start = time.perf_counter()
+            paths = set(tuple(path) for path in pg.iter_paths(size * size, prune=prune))
+            results.append((paths, pg.stats.nodes_expanded, time.perf_counter() - time_start))
+
+        (paths_a, expanded_a, time_a), (paths_b, expanded_b, time_b) = results
+        status = 'equal' if paths_a == paths_b else 'DIFFERENT'
+        print(f'{size}x{size} {start}->{end}: {len(paths_a)} paths, {status}, '
+              f'expanded {expanded_a:,} -> {expanded_b:,} nodes, {time_a:.2f}s -> {time_b:.2f}s')
+
+
+def bench_feasibility_check():
+    # with an even number of lane points, a line through all of them cannot
+    # start and end on the same colour; the bound tells that right away
+    # instead of searching until the time limit
+    for size in (4, 5, 6, 7):
+        pg = PathGenerator(size, size, (0, 0), (0, 2))
+        min_len = (size + 1) ** 2
+        time_start = time.perf_counter()
+        feasible = pg.is_feasible(min_len)
+        print(f'{size}x{size} (0, 0)->(0, 2) min_len {min_len}: feasible {feasible}, '
+              f'decided in {(time.perf_counter() - time_start) * 1000:.2f}ms')
+
+
+def bench_unique_puzzles(count: int = 50):
+    for size in range(3, 8):
+        random.seed(size)
+        board = Board(size, size, (0, 0), None)
+        board.generate_paths()
+
+        rates = []
+        for unique in (False, True):
+            board.config = cfg.engine.replace(unique_solution_puzzles=unique)
+            time_start = time.perf_counter()
+            for _ in range(count):
+                board.create_puzzle()
+            rates.append(count / (time.perf_counter() - time_start))
+
+        print(f'{size}x{size}: {rates[0]:,.0f} puzzles/s, unique solution {rates[1]:,.1f} puzzles/s')
+
+
+def bench_path_sampling(count: int = 100):
+    for size in (5, 7, 9):
+        random.seed(size)
+        time_start = time.perf_counter()
+        sampler = LongPathSampler(size, size, (0, 0), (size, size), size * size)
+        paths = [tuple(sampler.sample()) for _ in range(count)]
+        elapsed = time.perf_counter() - time_start
+
+        print(f'{size}x{size}: {count / elapsed:,.0f} sampled paths/s, '
+              f'{len(set(paths))}/{count} distinct, '
+              f'length {min(map(len, paths))}-{max(map(len, paths))}')
+
+
+def get_allocated_size(build) -> int:
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_path_store_memory():
+    for size in (4, 5, 6, 7):
+        random.seed(size)
+        pg = PathGenerator(size, size, (0, 0), (size, size))
+        paths = list(pg.iter_paths(size * size, time.time() + 2.0, prune=True))[:10000]
+
+        tuples_size = get_allocated_size(lambda: [list(path) for path in paths])
+        packed_size = get_allocated_size(lambda: PathStore(pg.start, paths))
+        print(f'{size}x{size}: {len(paths)} paths, lists of tuples {tuples_size / 1024:,.0f} KiB, '
+              f'packed {packed_size / 1024:,.0f} KiB ({tuples_size / packed_size:.0f}x smaller)')
+
+
+def bench_batch_validation():
+    if not vectorized.available:
+        print('NumPy is not installed')
+        return
+
+    for size in (4, 5, 6, 7):
+        random.seed(size)
+        board = Board(size, size, (0, 0), None, suite_config)
+        board.generate_paths(min_len=0)
+        board.create_puzzle()
+        paths = board.pg.paths
+
+        time_start = time.perf_counter()
+        expected = [board.check_solution(path) for path in paths]
+        python_time = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        matches = vectorized.match_triangles(board.topology, paths, board.triangle_values)
+        numpy_time = time.perf_counter() - time_start
+
+        status = 'equal' if list(matches) == expected else 'DIFFERENT'
+        print(f'{size}x{size}: {len(paths)} paths, {status}, check_solution {len(paths) / python_time:,.0f} paths/s, '
+              f'match_triangles {len(paths) / numpy_time:,.0f} paths/s ({python_time / numpy_time:.1f}x)')
+
+
+def bench_batch_difficulty(count: int = 5000):
+    for size in (4, 7):
+        random.seed(size)
+        board = Board(size, size, (0, 0), None, suite_config)
+        board.generate_paths()
+        grids = []
+        for _ in range(count):
+            board.create_puzzle()
+            grids.append(board.triangle_values)
+
+        time_start = time.perf_counter()
+        expected = []
+        for board.triangle_values in grids:
+            board.estimate_difficulty()
+            expected.append(board.difficulty)
+        python_time = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        difficulties = estimate_difficulties(grids)
+        batch_time = time.perf_counter() - time_start
+
+        status = 'equal' if difficulties == expected else 'DIFFERENT'
+        print(f'{size}x{size}: {count} grids, {status}, one by one {count / python_time:,.0f} grids/s, '
+              f'batch {count / batch_time:,.0f} grids/s ({python_time / batch_time:.1f}x, '
+              f'NumPy {"on" if vectorized.available else "off"})')
+
+
+# The string-of-bits codec that encoding.py replaced, kept as the reference
+# the bit-level one has to match byte for byte.
+
+def legacy_get_direction(a, b):
+    return {(0, 1): "00", (0, -1): "01", (1, 0): "10", (-1, 0): "11"}[(b[0] - a[0], b[1] - a[1])]
+
+
+def legacy_apply_direction(a, d):
+    d = {"00": (0, 1), "01": (0, -1), "10": (1, 0), "11": (-1, 0)}[d]
+    return a[0] + d[0], a[1] + d[1]
+
+
+def legacy_wind_cw(pd):
+    a = ["00", "10", "01", "11"]
+    return a[(a.index(pd) + 1) % 4]
+
+
+def legacy_wind_ccw(pd):
+    a = ["00", "10", "01", "11"]
+    return a[(a.index(pd) + 3) % 4]
+
+
+def legacy_encode_relative(d1, d2):
+    if d2 == d1:
+        return "0"
+    if legacy_wind_cw(d1) == d2:
+        return "10"
+    elif legacy_wind_ccw(d1) == d2:
+        return "11"
+
+
+def legacy_decode_relative(bs, pos, pd):
+    if bs[pos] == "0":
+        return pos + 1, pd
+    pos += 1
+    if bs[pos] == "0":
+        return pos + 1, legacy_wind_cw(pd)
+    else:
+        return pos + 1, legacy_wind_ccw(pd)
+
+
+def legacy_encode_default(data, default):
+    if data == default:
+        return "0"
+
+    return "1" + bin(data[0])[2:].zfill(3) + bin(data[1])[2:].zfill(3)
+
+
+def legacy_decode_default(bs, pos, default):
+    if bs[pos] == "0":
+        return pos + 1, default
+
+    return pos + 7, (int(bs[pos + 1:pos + 4], 2), int(bs[pos + 4:pos + 7], 2))
+
+
+def legacy_get_triangle_value(i, j, all_sublines):
+    prev_corner = (i, j)
+    d = "10"
+    all_possible_neighbor_lines = set()
+    for _ in range(4):
+        corner = legacy_apply_direction(prev_corner, d)
+        all_possible_neighbor_lines |= {(prev_corner, corner), (corner, prev_corner)}
+        d = legacy_wind_ccw(d)
+        prev_corner = corner
+
+    return len(all_possible_neighbor_lines & all_sublines)
+
+
+def legacy_ponchik_encode(width, height, start, exit_, triangle_values, solution_line):
+    bs = bin(width)[2:].zfill(3) + bin(height)[2:].zfill(3)
+    bs += legacy_encode_default(start, (0, 0)) + legacy_encode_default(exit_, (height, width))
+
+    all_sublines = {(x, y) for x, y in zip(solution_line[:-1], solution_line[1:])}
+
+    for i in range(height):
+        for j in range(width):
+            computed = legacy_get_triangle_value(i, j, all_sublines)
+            if computed == triangle_values[i * width + j]:
+                bs += "0"
+            elif triangle_values[i * width + j] == 0:
+                bs += "1"
+            else:
+                assert False
+
+    prev_d = legacy_get_direction(solution_line[0], solution_line[1])
+    bs += prev_d
+
+    for i in range(2, len(solution_line) - 1):
+        d = legacy_get_direction(solution_line[i - 1], solution_line[i])
+        bs += legacy_encode_relative(prev_d, d)
+        prev_d = d
+
+    pad = (len(bs) + 3) % 8
+    bs += "0" * ((8 - pad) % 8) + bin(pad)[2:].zfill(3)
+    return base64.b64encode(bytes([int(bs[i:i + 8], 2) for i in range(0, len(bs), 8)]))
+
+
+def legacy_ponchik_decode(data):
+    bs = "".join(bin(b)[2:].zfill(8) for b in base64.b64decode(data))
+    bs = bs[:-3 - (8 - int(bs[-3:], 2)) % 8]
+    width = int(bs[:3], 2)
+    height = int(bs[3:6], 2)
+    pos, start = legacy_decode_default(bs, 6, (0, 0))
+    pos, exit_ = legacy_decode_default(bs, pos, (height, width))
+
+    triangle_pos = pos
+    pos = triangle_pos + width * height
+
+    prev_d = bs[pos:pos + 2]
+    solution_line = [start, legacy_apply_direction(start, prev_d)]
+
+    pos += 2
+    while pos < len(bs):
+        pos, prev_d = legacy_decode_relative(bs, pos, prev_d)
+        solution_line.append(legacy_apply_direction(solution_line[-1], prev_d))
+    solution_line.append(exit_)
+
+    all_sublines = {(x, y) for x, y in zip(solution_line[:-1], solution_line[1:])}
+
+    triangle_values = []
+    for i in range(height):
+        for j in range(width):
+            computed = legacy_get_triangle_value(i, j, all_sublines)
+            triangle_values.append(computed if bs[triangle_pos + i * width + j] == "0" else 0)
+
+    return width, height, start, exit_, triangle_values, solution_line
+
+
+def get_random_line(start: Node, exit_: Node) -> List[Node]:
+    # shortest line with its steps in random order
+    dx = 1 if exit_[0] > start[0] else -1
+    dy = 1 if exit_[1] > start[1] else -1
+    steps = [(dx, 0)] * abs(exit_[0] - start[0]) + [(0, dy)] * abs(exit_[1] - start[1])
+    random.shuffle(steps)
+    line = [start]
+    for step in steps:
+        line.append((line[-1][0] + step[0], line[-1][1] + step[1]))
+    return line
+
+
+def get_codec_cases(w: int, h: int, layouts: str) -> List[tuple]:
+    # paths with random hidden triangles: every path of every start/exit pair ('all'),
+    # every path corner to corner ('corners') or one random line for each of
+    # 2000 random pairs ('random')
+    nodes = [(x, y) for x in range(h + 1) for y in range(w + 1)]
+    if layouts == 'random':
+        lines = [get_random_line(*random.sample(nodes, 2)) for _ in range(2000)]
+    else:
+        pairs = itertools.permutations(nodes, 2) if layouts == 'all' else [((0, 0), (h, w))]
+        lines = [path for start, exit_ in pairs
+                 for path in PathGenerator(w, h, start, exit_, set(), suite_config).iter_paths(0)]
+
+    cases = []
+    for line in lines:
+        bitboard = get_bitboard(w, h)
+        values = [t for row in bitboard.triangle_values(bitboard.edges_mask(line)) for t in row]
+        cases.append((w, h, line[0], line[-1], [0 if random.random() < 0.4 else t for t in values], line))
+
+    # bulk validation sees the layouts mixed
+    random.shuffle(cases)
+    return cases
+
+
+def bench_codec():
+    random.seed(0)
+    boards = [(2, 2, 'all'), (3, 2, 'all'), (3, 3, 'all'), (4, 4, 'corners'), (5, 4, 'corners'), (7, 7, 'random')]
+    for w, h, layouts in boards:
+        cases = get_codec_cases(w, h, layouts)
+        codes = [legacy_ponchik_encode(*case) for case in cases]
+
+        mismatches = 0
+        for case, code in zip(cases, codes):
+            decoded = ponchik_decode(code)
+            if ponchik_encode(*case) != code or decoded[4] != case[4] or decoded[5] != case[5]:
+                mismatches += 1
+        # a single step line decodes with the exit twice in the legacy codec
+        long_codes = [code for case, code in zip(cases, codes) if len(case[5]) > 2]
+        if [ponchik_decode(code) for code in long_codes] != [legacy_ponchik_decode(code) for code in long_codes]:
+            mismatches += 1
+
+        rates = []
+        for encode, decode in ((legacy_ponchik_encode, legacy_ponchik_decode), (ponchik_encode, ponchik_decode)):
+            time_start = time.perf_counter()
+            for case in cases:
+                encode(*case)
+            encode_time = time.perf_counter() - time_start
+
+            time_start = time.perf_counter()
+            for code in long_codes:
+                decode(code)
+            decode_time = time.perf_counter() - time_start
+            rates.append((len(cases) / encode_time, len(long_codes) / decode_time))
+
+        (legacy_encode, legacy_decode), (new_encode, new_decode) = rates
+        print(f'{w}x{h} {layouts} layouts: {len(cases)} paths, {"identical" if not mismatches else f"{mismatches} MISMATCHES"}, '
+              f'encode {legacy_encode:,.0f} -> {new_encode:,.0f} codes/s ({new_encode / legacy_encode:.1f}x), '
+              f'decode {legacy_decode:,.0f} -> {new_decode:,.0f} codes/s ({new_decode / legacy_decode:.1f}x)')
+
+
+# The suite below times the hot paths on fixed seeds and fixed layouts, so
+# two runs on the same machine are comparable. Results are keyed by
+# 'operation/WxH/layout' and hold the best of `repeat` rounds.
+
+suite_sizes = range(2, 8)
+# independent of custom_config.toml, never touches the path cache
+suite_config = EngineConfig(path_cache=False, max_paths_generated=2000, generation_time_limit=10.0)
+suite_puzzles = 20
+# solving a single 7x7 puzzle can take seconds
+suite_solved_puzzles = 3
+default_baseline_path = 'benchmarks_baseline.json'
+
+SuiteResults = Dict[str, Dict[str, float]]
+
+
+def get_suite_layouts(size: int) -> List[Tuple[str, Node, Node]]:
+    return [('corners', (0, 0), (size, size)),
+            ('side', (0, 0), (0, size)),
+            ('center', (size // 2, size // 2), (size, size))]
+
+
+def measure(func, number: int, repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    best = timer.timeit(number)
+    # rounds of more than a second are steady enough and not worth repeating
+    if best < 1.0 and repeat > 1:
+        best = min(best, *timer.repeat(repeat - 1, number))
+
+    best /= number
+    return {'ops_per_sec': 1 / best, 'ms_per_op': best * 1000}
+
+
+def measure_layout(size: int, start: Node, end: Node, seed: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    min_len = size * size
+
+    def generate():
+        random.seed(seed)
+        PathGenerator(size, size, start, end, config=suite_config).run(min_len)
+
+    results['generate'] = measure(generate, 1, repeat)
+
+    random.seed(seed)
+    board = Board(size, size, start, end, suite_config)
+    board.generate_paths()
+
+    puzzles = []
+    for _ in range(suite_puzzles):
+        board.create_puzzle()
+        puzzles.append((board.solution_line, board.triangle_values))
+
+    def run_all(operation, count: int = len(puzzles)):
+        def run():
+            for solution_line, triangle_values in puzzles[:count]:
+                board.solution_line = solution_line
+                board.triangle_values = triangle_values
+                operation()
+        return run
+
+    flat_puzzles = [(line, [t for row in values for t in row]) for line, values in puzzles]
+    codes = [ponchik_encode(size, size, start, end, values, line) for line, values in flat_puzzles]
+
+    random.seed(seed)
+    cases = {
+        'solve': (run_all(board.solve, suite_solved_puzzles), 1),
+        'check_solution': (run_all(lambda: board.check_solution(board.solution_line)), 20),
+        'find_triangle_values': (run_all(board.find_triangle_values), 20),
+        'estimate_difficulty': (run_all(board.estimate_difficulty), 20),
+        'encode': (lambda: [ponchik_encode(size, size, start, end, values, line)
+                            for line, values in flat_puzzles], 20),
+        'decode': (lambda: [ponchik_decode(code) for code in codes], 20),
+    }
+    for name, (func, number) in cases.items():
+        result = measure(func, number, repeat)
+        # per puzzle, not per round over all of them
+        count = suite_solved_puzzles if name == 'solve' else len(puzzles)
+        results[name] = {'ops_per_sec': result['ops_per_sec'] * count, 'ms_per_op': result['ms_per_op'] / count}
+
+    return results
+
+
+def run_suite(repeat: int = 3) -> dict:
+    results: SuiteResults = {}
+    for size in suite_sizes:
+        for layout, start, end in get_suite_layouts(size):
+            if not PathGenerator(size, size, start, end, config=suite_config).is_feasible(size * size):
+                continue
+
+            for name, result in measure_layout(size, start, end, size, repeat).items():
+                key = f'{name}/{size}x{size}/{layout}'
+                results[key] = result
+                print(f'{key:40} {result["ops_per_sec"]:14,.1f} ops/s {result["ms_per_op"]:12.4f} ms/op',
+                      file=sys.stderr)
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_results(results: SuiteResults, baseline: SuiteResults, tolerance: float) -> List[str]:
+    """Prints the speed-up of every case against the baseline, returns the regressed cases."""
+    regressions = []
+    for key in sorted(results.keys() & baseline.keys()):
+        ratio = results[key]['ops_per_sec'] / baseline[key]['ops_per_sec']
+        mark = ''
+        if ratio < 1 - tolerance:
+            mark = '  REGRESSION'
+            regressions.append(key)
+        print(f'{key:40} {ratio:6.2f}x{mark}')
+
+    for key in sorted(baseline.keys() - results.keys()):
+        print(f'{key:40}   missing')
+
+    return regressions
+
+
+def suite_main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks.py suite')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results as JSON here, stdout by default')
+    parser.add_argument('--baseline', default=default_baseline_path, help='compare against these results')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slow-down reported as a regression')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(text + '\n')
+    elif args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.save_baseline:
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f'no baseline at {args.baseline}', file=sys.stderr)
+        return 0
+
+    with contextlib.redirect_stdout(sys.stderr):
+        print(f'speed against {args.baseline} ({baseline["machine"]}, {baseline["time"]}):')
+        regressions = compare_results(report['results'], baseline['results'], args.tolerance)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    # python benchmarks.py suite [--save-baseline] for the comparable suite,
+    # no arguments for the one-off comparisons above
+    if sys.argv[1:2] == ['suite']:
+        sys.exit(suite_main(sys.argv[2:]))
+
+    bench_path_generation()
+    bench_reachability_pruning()
+    bench_feasibility_check()
+    bench_unique_puzzles()
+    bench_path_sampling()
+    bench_path_store_memory()
+    bench_batch_validation()
+    bench_batch_difficulty()
+    bench_codec()
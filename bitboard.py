@@ -0,0 +1,122 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+Node = Tuple[int, int]
+FullPath = List[Node]
+
+
+class BitBoard:
+    """Integer bitmask view of a board.
+
+    Every lane point and every lane segment gets its own bit, so a set of
+    visited nodes or used edges is a single int and the triangle value of
+    a cell is the popcount of the used edges masked with the cell's edges.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.w = width
+        self.h = height
+
+        self.node_bits: Dict[Node, int] = {}
+        for x in range(height + 1):
+            for y in range(width + 1):
+                self.node_bits[(x, y)] = 1 << (x * (width + 1) + y)
+
+        self.all_nodes_mask = (1 << len(self.node_bits)) - 1
+        # checkerboard colouring, a line always alternates between the colours
+        self.even_nodes_mask = sum(bit for (x, y), bit in self.node_bits.items() if (x + y) % 2 == 0)
+        self.first_column_mask = sum(self.node_bits[(x, 0)] for x in range(height + 1))
+        self.last_column_mask = sum(self.node_bits[(x, width)] for x in range(height + 1))
+
+        # both directions of a segment share the same bit
+        self.edges: List[Tuple[Node, Node]] = []
+        self.edge_bits: Dict[Tuple[Node, Node], int] = {}
+        for x, y in self.node_bits:
+            for neighbor in ((x, y + 1), (x + 1, y)):
+                if neighbor in self.node_bits:
+                    self.edge_bits[((x, y), neighbor)] = 1 << len(self.edges)
+                    self.edge_bits[(neighbor, (x, y))] = 1 << len(self.edges)
+                    self.edges.append(((x, y), neighbor))
+
+        self.cell_masks: List[List[int]] = []
+        for i in range(height):
+            self.cell_masks.append([])
+            for j in range(width):
+                sw, nw, ne, se = (i, j), (i + 1, j), (i + 1, j + 1), (i, j + 1)
+                self.cell_masks[i].append(self.edge_bits[(sw, nw)] | self.edge_bits[(nw, ne)] |
+                                          self.edge_bits[(ne, se)] | self.edge_bits[(se, sw)])
+
+    def nodes_mask(self, path: FullPath) -> int:
+        result = 0
+        for node in path:
+            result |= self.node_bits[node]
+
+        return result
+
+    def edges_mask(self, path: FullPath) -> int:
+        result = 0
+        for a, b in zip(path[:-1], path[1:]):
+            result |= self.edge_bits[(a, b)]
+
+        return result
+
+    def path_from_edges(self, edges: int, start: Node) -> FullPath:
+        # a line is a simple path, so following the used edges
+        # from the start recovers the node order
+        path = [start]
+        prev = None
+        while True:
+            x, y = path[-1]
+            for node in ((x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1)):
+                if node != prev and edges & self.edge_bits.get((path[-1], node), 0):
+                    prev = path[-1]
+                    path.append(node)
+                    break
+            else:
+                return path
+
+    def flood(self, seed: int, free: int) -> int:
+        # all nodes of `free` connected to the `seed` nodes,
+        # growing the whole frontier with a few shifts per step
+        row = self.w + 1
+        not_first_column = ~self.first_column_mask
+        not_last_column = ~self.last_column_mask
+        reached = seed & free
+        while True:
+            grown = (reached | (reached << row) | (reached >> row) |
+                     ((reached << 1) & not_first_column) |
+                     ((reached >> 1) & not_last_column)) & free
+            if grown == reached:
+                return reached
+            reached = grown
+
+    def longest_path_bound(self, a: Node, b: Node, free: int) -> int:
+        # Upper bound on the node count of a line from a to b using only
+        # `free` nodes (both ends included). Colours alternate along the
+        # line, and the parity of the Manhattan distance from a to b tells
+        # whether it starts and ends on the same colour
+        even_count = (free & self.even_nodes_mask).bit_count()
+        odd_count = free.bit_count() - even_count
+        if (a[0] + a[1]) % 2 == 0:
+            own_count, other_count = even_count, odd_count
+        else:
+            own_count, other_count = odd_count, even_count
+
+        if (abs(a[0] - b[0]) + abs(a[1] - b[1])) % 2 == 0:
+            return 2 * min(own_count - 1, other_count) + 1
+
+        return 2 * min(own_count, other_count)
+
+    def triangle_value(self, i: int, j: int, edges: int) -> int:
+        return (edges & self.cell_masks[i][j]).bit_count()
+
+    def triangle_values(self, edges: int) -> List[List[int]]:
+        return [[(edges & mask).bit_count() for mask in row] for row in self.cell_masks]
+
+
+@lru_cache(maxsize=256)
+def get_bitboard(width: int, height: int) -> BitBoard:
+    # Geometry only, shared by every start and exit of a board size. The codec
+    # uses it so that codes of many layouts do not evict the topologies
+    # the solver and the drawing code keep in get_topology's cache.
+    return BitBoard(width, height)
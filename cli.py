@@ -0,0 +1,169 @@
+import time
+
+# everything imported from here on counts towards the reported start-up time
+time_start = time.perf_counter()
+
+import argparse
+import logging
+import sys
+from typing import List
+
+import core_config as cfg
+import metrics
+from encoding import ponchik_encode, ponchik_decode
+from models import Board, Node, FullPath
+from topology import get_topology
+
+time_ready = time.perf_counter()
+
+# none of these may end up in sys.modules, the CLI has to run without a display
+gui_modules = ('arcade', 'pyglet', 'config', 'game_drawing', 'views')
+
+
+def parse_node(text: str) -> Node:
+    x, y = text.split(',')
+    return int(x), int(y)
+
+
+def parse_line(text: str) -> FullPath:
+    return [parse_node(node) for node in text.split()]
+
+
+def format_line(line: FullPath) -> str:
+    return ' '.join(f'{x},{y}' for x, y in line)
+
+
+def generate(args):
+    config = cfg.engine.replace(unique_solution_puzzles=True) if args.unique else cfg.engine
+    board = Board(args.width, args.height, args.start or cfg.board_start, args.exit, config)
+
+    board.generate_paths()
+
+    for _ in range(args.count):
+        board.create_puzzle()
+        board.estimate_difficulty()
+        print(f'{board.generate_code()}\t{board.difficulty:.1f}')
+
+
+def solve(args):
+    for code in args.codes:
+        board = Board(1, 1, (0, 0), None)
+        board.load_custom_puzzle(code)
+        board.estimate_difficulty()
+
+        if args.all:
+            solutions = board.solve()
+        else:
+            solution = board.first_solution()
+            solutions = [solution] if solution is not None else []
+
+        if not solutions:
+            print(f'{code}\tunsolvable')
+            continue
+
+        count = len(solutions) if args.all else board.count_solutions(args.limit)
+        print(f'{code}\t{count} solutions\tdifficulty {board.difficulty:.1f}')
+        for solution in solutions:
+            print(format_line(solution))
+
+
+def encode(args):
+    line = parse_line(args.line)
+    topology = get_topology(args.width, args.height, line[0], line[-1])
+    edges = topology.edges_mask(line)
+
+    if args.triangles is not None:
+        triangle_values = [int(t) for t in args.triangles.split(',')]
+        if len(triangle_values) != args.width * args.height:
+            sys.exit(f'expected {args.width * args.height} triangle values, got {len(triangle_values)}')
+    else:
+        # every triangle shown
+        triangle_values = [t for row in topology.triangle_values(edges) for t in row]
+
+    print(ponchik_encode(args.width, args.height, line[0], line[-1], triangle_values, line).decode())
+
+
+def decode(args):
+    w, h, start, exit_, triangle_values, solution = ponchik_decode(args.code.encode())
+    print(f'size {w}x{h}, start {start[0]},{start[1]}, exit {exit_[0]},{exit_[1]}')
+    # top row first, as on screen, hidden triangles as dots
+    for i in reversed(range(h)):
+        print(' '.join(str(t) if t else '.' for t in triangle_values[i * w:(i + 1) * w]))
+    print(format_line(solution))
+
+
+def bench(args):
+    # imported here, the benchmarks are not part of the start-up time
+    import benchmarks
+
+    names = args.names or [name[len('bench_'):] for name in dir(benchmarks) if name.startswith('bench_')]
+    for name in names:
+        print(f'--- {name}')
+        getattr(benchmarks, f'bench_{name}')()
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Generate, solve and check triangle puzzles without the GUI.')
+    parser.add_argument('--timing', action='store_true',
+                        help='report start-up time and loaded GUI modules on stderr')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='log search stats on stderr, -vv also for every solver call')
+    parser.add_argument('--metrics', metavar='PATH', help='write timings and counters as JSON here on exit')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('generate', help='print new puzzle codes with their difficulty')
+    p.add_argument('width', type=int)
+    p.add_argument('height', type=int)
+    p.add_argument('--start', type=parse_node, help='x,y, the config start by default')
+    p.add_argument('--exit', type=parse_node, help='x,y, the top right corner by default')
+    p.add_argument('-n', '--count', type=int, default=1)
+    p.add_argument('--unique', action='store_true', help='only puzzles with a single solution')
+    p.set_defaults(func=generate)
+
+    p = subparsers.add_parser('solve', help='print the solutions of puzzle codes')
+    p.add_argument('codes', nargs='+')
+    p.add_argument('--all', action='store_true', help='print every solution, shortest first')
+    p.add_argument('--limit', type=int, default=1000, help='stop counting solutions here')
+    p.set_defaults(func=solve)
+
+    p = subparsers.add_parser('encode', help='print the code of a puzzle')
+    p.add_argument('width', type=int)
+    p.add_argument('height', type=int)
+    p.add_argument('line', help='solution line from start to exit, e.g. "0,0 0,1 1,1"')
+    p.add_argument('--triangles', help='comma separated values row by row, 0 for hidden, all shown by default')
+    p.set_defaults(func=encode)
+
+    p = subparsers.add_parser('decode', help='print the board, triangles and solution of a code')
+    p.add_argument('code')
+    p.set_defaults(func=decode)
+
+    p = subparsers.add_parser('bench', help='run benchmarks, all of them by default')
+    p.add_argument('names', nargs='*', help='e.g. path_generation unique_puzzles')
+    p.set_defaults(func=bench)
+
+    return parser
+
+
+def report_timing():
+    loaded: List[str] = [name for name in gui_modules if name in sys.modules]
+    print(f'start-up {(time_ready - time_start) * 1000:.1f} ms, '
+          f'GUI modules loaded: {", ".join(loaded) or "none"}', file=sys.stderr)
+
+
+def main():
+    args = get_parser().parse_args()
+    logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)],
+                        format='%(message)s')
+    if args.timing:
+        report_timing()
+    if args.metrics:
+        metrics.registry.enable(args.metrics)
+
+    try:
+        args.func(args)
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,10 @@
-import arcade
-import toml
+from functools import lru_cache
 
-try:
-    with open('custom_config.toml') as f:
-        cc = toml.load(f)
-except FileNotFoundError:
-    cc = {}
+# the engine settings and the parsed custom config (cc)
+from core_config import *
+
+# Colours built from arcade constants live in get_arcade_colors at the bottom
+# and are only resolved on first use, importing this module does not import arcade.
 
 window_width = cc.get('window_width', 800)
 window_height = cc.get('window_height', 800)
@@ -22,7 +21,6 @@ text_left_margin = cc.get('text_left_margin', 20)
 # help tip
 help_tip_top_margin = cc.get('help_tip_top_margin', 20)
 help_tip_font_size = cc.get('help_tip_font_size', 16)
-help_tip_color = arcade.color.RED
 
 help_main_margin = cc.get('help_main_margin', 50)
 help_top_margin = cc.get('help_top_margin', 120)
@@ -36,7 +34,6 @@ help_border_width = cc.get('help_border_width', 3)
 
 popup_top_margin = cc.get('popup_top_margin', 70)
 popup_font_size = cc.get('popup_font_size', 24)
-popup_color = [arcade.color.WHITE + (255,), arcade.color.BLACK + (255,)]
 
 # how fast the popup will turn transparent
 # default is 2, which means a popup will live for
@@ -46,42 +43,65 @@ popup_alpha_step = cc.get('popup_alpha_step', 2)
 
 theme = cc.get('theme', 0)
 
-bg_color = [arcade.color.SMOKY_BLACK, (163, 178, 207)]
 board_color = [(130, 110, 45), (138, 131, 132)]
-cell_color = [arcade.color.SMOKY_BLACK, (163, 178, 207)]
 cell_alpha = 180
-solution_color = arcade.color.RED + (170,)
 triangle_color = (255, 187, 0)
 triangle_lights_color = [(255, 187, 0), (38, 28, 0)]
-wrong_triangle_color = arcade.color.RED
 line_color = [(254, 213, 135), (228, 191, 167)]
 solved_line_color = (254, 158, 1)
-help_font_color = arcade.color.BLACK
-help_border_color = arcade.color.WHITE
-help_bg_color = arcade.color.ASH_GREY + (230,)
-hint_color = arcade.color.GREEN + (100,)
-
-board_width = cc.get('board_width', 4)
-board_height = cc.get('board_height', 4)
-board_start = cc.get('board_start', [0, 0])
-board_exit = cc.get('board_exit', None)     # by default the exit is at the top right corner
-max_board_width = 7
-
-hide_triangle_probability = cc.get('hide_triangle_probability', 0.4)
-max_paths_generated = cc.get('max_paths_generated', 10000)
-generation_time_limit = cc.get('generation_time_limit', 1.0)
-obstacles_count = cc.get('obstacles_count', 0)
+
 custom_puzzle_code = cc.get('custom_puzzle_code', None)
+# seconds per frame the solve view spends looking for more solutions
+solve_time_slice = cc.get('solve_time_slice', 0.01)
+# solver nodes between two checks of the time slice, a few milliseconds worth
+solve_pause_nodes = cc.get('solve_pause_nodes', 200)
+# solver nodes for a solution the solve view waits for, e.g. to copy the code,
+# about a second like the old path generation time limit
+solve_max_nodes = cc.get('solve_max_nodes', 70000)
+# the solve view stops looking once it has this many solutions
+max_shown_solutions = cc.get('max_shown_solutions', 10000)
 
 menu_vertical_margin = cc.get('menu_vertical_margin', 80)
 menu_font_size = cc.get('menu_font_size', 42)
-menu_font_color = arcade.color.WHITE
-menu_active_color = arcade.color.GREEN
 menu_bg_color = (55, 57, 63)
-menu_popup_color = arcade.color.RED
 
 button_width = 150
 button_height = 50
 bottom_panel_margin = 20
 top_panel_margin = 90
 start_exit_cursor_color = (0, 255, 0, 100)
+
+
+@lru_cache(maxsize=None)
+def get_arcade_colors() -> dict:
+    import arcade
+
+    return {
+        'help_tip_color': arcade.color.RED,
+        'popup_color': [arcade.color.WHITE + (255,), arcade.color.BLACK + (255,)],
+        'bg_color': [arcade.color.SMOKY_BLACK, (163, 178, 207)],
+        'cell_color': [arcade.color.SMOKY_BLACK, (163, 178, 207)],
+        'solution_color': arcade.color.RED + (170,),
+        'wrong_triangle_color': arcade.color.RED,
+        'help_font_color': arcade.color.BLACK,
+        'help_border_color': arcade.color.WHITE,
+        'help_bg_color': arcade.color.ASH_GREY + (230,),
+        'hint_color': arcade.color.GREEN + (100,),
+        'menu_font_color': arcade.color.WHITE,
+        'menu_active_color': arcade.color.GREEN,
+        'menu_popup_color': arcade.color.RED,
+    }
+
+
+def __getattr__(name: str):
+    # dunder lookups come from tools probing the module, not from the views
+    if name.startswith('__'):
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    colors = get_arcade_colors()
+    if name not in colors:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    # later lookups find the colours as plain module globals
+    globals().update(colors)
+    return colors[name]
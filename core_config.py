@@ -0,0 +1,83 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Engine settings, kept apart from config.py so that generating and solving
+# puzzles imports nothing outside the standard library. config.py
+# re-exports everything from here.
+
+
+def load_custom_config() -> dict:
+    try:
+        with open('custom_config.toml', 'rb') as f:
+            text = f.read().decode()
+    except FileNotFoundError:
+        return {}
+
+    try:
+        import tomllib
+    except ImportError:
+        # before Python 3.11
+        import toml as tomllib
+
+    return tomllib.loads(text)
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """Settings of Board, PathGenerator and the modules around them.
+
+    Every Board takes one, `engine` below is the default built from the
+    custom config. Use `engine.replace(...)` for a one-off variation
+    instead of changing module globals, it is picklable so worker
+    processes get the config of the board that started them."""
+
+    hide_triangle_probability: float = 0.4
+    # only hide triangles as long as the puzzle keeps a single solution
+    unique_solution_puzzles: bool = False
+    # a triangle stays visible if proving uniqueness without it takes longer than this
+    uniqueness_check_max_nodes: int = 5000
+    max_paths_generated: int = 10000
+    generation_time_limit: float = 1.0
+    # draw long paths from a random local-move sampler instead of enumerating them first
+    path_sampling: bool = False
+    # enumerated paths are kept on disk per board layout and max_paths_generated and reused
+    # on the next launch, unless the run was stopped by generation_time_limit
+    path_cache: bool = True
+    path_cache_dir: str = 'path_cache'
+    path_cache_max_bytes: int = 256 * 1024 * 1024
+    # processes used for path generation, 0 means one per core
+    generation_workers: int = 1
+    obstacles_count: int = 0
+    # time candidate generation and pruning separately in SearchStats, costs a few percent
+    search_phase_timing: bool = False
+    puzzle_bank_dir: str = 'puzzle_bank'
+
+    def replace(self, **changes) -> 'EngineConfig':
+        return dataclasses.replace(self, **changes)
+
+
+def load_engine_config(custom_config: dict) -> EngineConfig:
+    names = {field.name for field in dataclasses.fields(EngineConfig)}
+    return EngineConfig(**{name: value for name, value in custom_config.items() if name in names})
+
+
+cc = load_custom_config()
+engine = load_engine_config(cc)
+
+board_width = cc.get('board_width', 4)
+board_height = cc.get('board_height', 4)
+board_start = cc.get('board_start', [0, 0])
+board_exit = cc.get('board_exit', None)     # by default the exit is at the top right corner
+# the largest board the solve view can be resized to, the drawing does not scale
+# to the window; puzzle codes go up to encoding.max_size
+max_board_width = 7
+
+# puzzles generated ahead of time in the background for the play view
+prefetch_queue_size = cc.get('prefetch_queue_size', 5)
+# e.g. [40, 60], puzzles are then taken from the puzzle bank first
+puzzle_difficulty_range: Optional[Tuple[float, float]] = cc.get('puzzle_difficulty_range', None)
+
+# timings and counters of the whole process, written as JSON on exit
+metrics = cc.get('metrics', False)
+metrics_path = cc.get('metrics_path', 'metrics.json')
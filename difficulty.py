@@ -0,0 +1,37 @@
+from typing import List
+
+# concentration of visible triangles that gives the highest multiplier
+magic_concentration = 0.75
+
+
+def get_concentration_difficulty_multiplier(conc: float) -> float:
+    # anything below or above the magic number will get lower multiplier
+    if conc > magic_concentration:
+        delta = conc - magic_concentration
+        conc = magic_concentration - delta
+
+    return conc / magic_concentration
+
+
+def get_difficulty(triangle_values: List[List[int]], width: int, height: int) -> float:
+    triangles_count = len([x for row in triangle_values for x in row if x >= 1])
+    if width < 2 or height < 2 or triangles_count == 0:
+        return 0
+
+    score = 0
+    concentration = triangles_count / (width * height)
+
+    # every 2x2 block of the board, overlapping
+    for i in range(height - 1):
+        for j in range(width - 1):
+            unfiltered_block = triangle_values[i][j:j + 2] + triangle_values[i + 1][j:j + 2]
+            block = [x for x in unfiltered_block if x >= 1]
+
+            # 0 triangles - 1 score
+            # 1 triangle  - 2 score
+            # 2 triangles - 4 score
+            # 3 triangles - 8 score
+            # 4 triangles - 16 score
+            score += 2 ** len(block)
+
+    return score * get_concentration_difficulty_multiplier(concentration)
@@ -1,5 +1,35 @@
 import base64
 
+from bitboard import get_bitboard
+
+# 2-bit direction codes, the same order as path_store.directions
+directions = ((0, 1), (0, -1), (1, 0), (-1, 0))
+direction_codes = {d: i for i, d in enumerate(directions)}
+
+# winding order of the codes is 00, 10, 01, 11
+wind_cw = (2, 3, 1, 0)
+wind_ccw = (3, 2, 0, 1)
+
+# (bits, bit count) of a turn from direction d1 to d2, indexed by d1 * 4 + d2;
+# going straight is 0, turning clockwise 10 and counter-clockwise 11
+relative_codes = [None] * 16
+for d in range(4):
+    relative_codes[d * 4 + d] = (0b0, 1)
+    relative_codes[d * 4 + wind_cw[d]] = (0b10, 2)
+    relative_codes[d * 4 + wind_ccw[d]] = (0b11, 2)
+
+
+# Codes start with the width in 3 bits. A width of 0 never happens,
+# so 000 is followed by a 3-bit format version instead:
+#   legacy     3-bit width and height, 3-bit start and exit coordinates
+#   version 1  4-bit width and height, coordinates as wide as the
+#              larger of the two needs
+# Everything after the geometry is the same in both.
+version_escape = 0
+current_version = 1
+max_legacy_size = 7
+max_size = 15
+
 
 def bear64encode(data):
     return base64.b64encode(data).decode().replace("/", "_").replace("+", "🐻").rstrip("=")
@@ -9,131 +39,171 @@ def bear64decode(data):
     return base64.b64decode(data.replace("_", "/").replace("🐻", "+") + "==")
 
 
-def get_direction(a, b):
-    return {(0, 1): "00", (0, -1): "01", (1, 0): "10", (-1, 0): "11"}[(b[0] - a[0], b[1] - a[1])]
+class BitWriter:
+    """Appends bit fields most significant bit first. Whole bytes go
+    to a bytearray as soon as they are complete, so the pending int stays small."""
 
+    def __init__(self):
+        self.data = bytearray()
+        self.pending = 0
+        self.pending_count = 0
 
-def apply_direction(a, d):
-    d = {"00": (0, 1), "01": (0, -1), "10": (1, 0), "11": (-1, 0)}[d]
-    return a[0] + d[0], a[1] + d[1]
+    def write(self, value: int, count: int):
+        self.pending = (self.pending << count) | value
+        self.pending_count += count
+        while self.pending_count >= 8:
+            self.pending_count -= 8
+            self.data.append(self.pending >> self.pending_count)
+            self.pending &= (1 << self.pending_count) - 1
 
+    def __len__(self) -> int:
+        return len(self.data) * 8 + self.pending_count
 
-def wind_cw(pd):
-    a = ["00", "10", "01", "11"]
-    return a[(a.index(pd) + 1) % 4]
+    def to_bytes(self) -> bytes:
+        assert self.pending_count == 0, 'the last byte is not complete'
+        return bytes(self.data)
 
 
-def wind_ccw(pd):
-    a = ["00", "10", "01", "11"]
-    return a[(a.index(pd) + 3) % 4]
+class BitReader:
+    """Reads bit fields most significant bit first out of one big int."""
 
+    def __init__(self, data: bytes, bit_count: int):
+        # bits past bit_count are ignored, e.g. the padding at the end
+        self.value = int.from_bytes(data, 'big') >> (len(data) * 8 - bit_count)
+        self.bit_count = bit_count
+        self.pos = 0
 
-def encode_relative(d1, d2):
-    if d2 == d1:
-        return "0"
-    if wind_cw(d1) == d2:
-        return "10"
-    elif wind_ccw(d1) == d2:
-        return "11"
+    def read(self, count: int) -> int:
+        self.pos += count
+        return (self.value >> (self.bit_count - self.pos)) & ((1 << count) - 1)
 
+    def at_end(self) -> bool:
+        return self.pos >= self.bit_count
 
-def decode_relative(bs, pos, pd):
-    if bs[pos] == "0":
-        return pos + 1, pd
-    pos += 1
-    if bs[pos] == "0":
-        return pos + 1, wind_cw(pd)
+
+def encode_default(writer: BitWriter, node, default, coordinate_bits: int = 3):
+    if node == default:
+        writer.write(0, 1)
     else:
-        return pos + 1, wind_ccw(pd)
+        writer.write(1, 1)
+        writer.write(node[0], coordinate_bits)
+        writer.write(node[1], coordinate_bits)
 
 
-def encode_default(data, default):
-    if data == default:
-        return "0"
+def decode_default(reader: BitReader, default, coordinate_bits: int = 3):
+    if not reader.read(1):
+        return default
 
-    return "1" + bin(data[0])[2:].zfill(3) + bin(data[1])[2:].zfill(3)
+    return reader.read(coordinate_bits), reader.read(coordinate_bits)
 
 
-def decode_default(bs, pos, default):
-    if bs[pos] == "0":
-        return pos + 1, default
+def get_coordinate_bits(width: int, height: int) -> int:
+    # coordinates go up to the width and height themselves
+    return max(width, height).bit_length()
 
-    return pos + 7, (int(bs[pos + 1:pos + 4], 2), int(bs[pos + 4:pos + 7], 2))
 
+def encode_geometry(writer: BitWriter, width: int, height: int, start, exit_):
+    # boards that fit the legacy layout keep it, so their codes do not change
+    if width <= max_legacy_size and height <= max_legacy_size:
+        writer.write(width << 3 | height, 6)
+        coordinate_bits = 3
+    else:
+        writer.write(version_escape, 3)
+        writer.write(current_version, 3)
+        writer.write(width << 4 | height, 8)
+        coordinate_bits = get_coordinate_bits(width, height)
 
-def get_triangle_value(i, j, all_sublines):
-    prev_corner = (i, j)
-    d = "10"
-    all_possible_neighbor_lines = set()
-    for _ in range(4):
-        corner = apply_direction(prev_corner, d)
-        all_possible_neighbor_lines |= {(prev_corner, corner), (corner, prev_corner)}
-        d = wind_ccw(d)
-        prev_corner = corner
+    encode_default(writer, start, (0, 0), coordinate_bits)
+    encode_default(writer, exit_, (height, width), coordinate_bits)
 
-    return len(all_possible_neighbor_lines & all_sublines)
+
+def decode_geometry(reader: BitReader):
+    width = reader.read(3)
+    if width != version_escape:
+        height = reader.read(3)
+        coordinate_bits = 3
+    else:
+        version = reader.read(3)
+        if version != current_version:
+            raise ValueError(f'unknown puzzle code version {version}')
+        width = reader.read(4)
+        height = reader.read(4)
+        coordinate_bits = get_coordinate_bits(width, height)
+
+    start = decode_default(reader, (0, 0), coordinate_bits)
+    exit_ = decode_default(reader, (height, width), coordinate_bits)
+    return width, height, start, exit_
 
 
 def ponchik_encode(width, height, start, exit_, triangle_values, solution_line):
-    # todo add support up to 15x15
-    assert width <= 7 and height <= 7
+    assert 1 <= width <= max_size and 1 <= height <= max_size
     assert solution_line[0] == start
     assert solution_line[-1] == exit_
 
-    bs = bin(width)[2:].zfill(3) + bin(height)[2:].zfill(3)
-    bs += encode_default(start, (0, 0)) + encode_default(exit_, (height, width))
-
-    all_sublines = {(x, y) for x, y in zip(solution_line[:-1], solution_line[1:])}
-
-    for i in range(height):
-        for j in range(width):
-            computed = get_triangle_value(i, j, all_sublines)
-            if computed == triangle_values[i * width + j]:
-                bs += "0"
-            elif triangle_values[i * width + j] == 0:
-                bs += "1"
+    writer = BitWriter()
+    encode_geometry(writer, width, height, start, exit_)
+
+    # one bit per cell, set if the triangle is hidden
+    bitboard = get_bitboard(width, height)
+    computed_values = bitboard.triangle_values(bitboard.edges_mask(solution_line))
+    for i, row in enumerate(computed_values):
+        for j, computed in enumerate(row):
+            triangle_value = triangle_values[i * width + j]
+            if computed == triangle_value:
+                writer.write(0, 1)
+            elif triangle_value == 0:
+                writer.write(1, 1)
             else:
                 assert False
 
-    prev_d = get_direction(solution_line[0], solution_line[1])
-    bs += prev_d
-
-    for i in range(2, len(solution_line) - 1):
-        d = get_direction(solution_line[i - 1], solution_line[i])
-        bs += encode_relative(prev_d, d)
-        prev_d = d
+    # the first step as is, then turns relative to the previous step,
+    # the last step into the exit is implied
+    steps_count = max(len(solution_line) - 2, 1)
+    codes = [direction_codes[(b[0] - a[0], b[1] - a[1])]
+             for a, b in zip(solution_line[:steps_count], solution_line[1:steps_count + 1])]
+    writer.write(codes[0], 2)
+    for prev_code, code in zip(codes[:-1], codes[1:]):
+        writer.write(*relative_codes[prev_code * 4 + code])
 
-    pad = (len(bs) + 3) % 8
-    bs += "0" * ((8 - pad) % 8) + bin(pad)[2:].zfill(3)
-    return base64.b64encode(bytes([int(bs[i:i + 8], 2) for i in range(0, len(bs), 8)]))
+    # zero padding up to whole bytes, the last 3 bits tell how long the padding is
+    pad = (len(writer) + 3) % 8
+    writer.write(0, (8 - pad) % 8)
+    writer.write(pad, 3)
+    return base64.b64encode(writer.to_bytes())
 
 
 def ponchik_decode(data):
-    bs = "".join(bin(b)[2:].zfill(8) for b in base64.b64decode(data))
-    bs = bs[:-3 - (8 - int(bs[-3:], 2)) % 8]
-    width = int(bs[:3], 2)
-    height = int(bs[3:6], 2)
-    pos, start = decode_default(bs, 6, (0, 0))
-    pos, exit_ = decode_default(bs, pos, (height, width))
+    raw = base64.b64decode(data)
+    pad = raw[-1] & 0b111
+    reader = BitReader(raw, len(raw) * 8 - 3 - (8 - pad) % 8)
+
+    width, height, start, exit_ = decode_geometry(reader)
+    hidden = reader.read(width * height)
 
-    triangle_pos = pos
-    pos = triangle_pos + width * height
+    code = reader.read(2)
+    x, y = start
+    dx, dy = directions[code]
+    solution_line = [start, (x + dx, y + dy)]
 
-    prev_d = bs[pos:pos + 2]
-    solution_line = [start, apply_direction(start, prev_d)]
+    while not reader.at_end():
+        if reader.read(1):
+            code = wind_ccw[code] if reader.read(1) else wind_cw[code]
+        x, y = solution_line[-1]
+        dx, dy = directions[code]
+        solution_line.append((x + dx, y + dy))
 
-    pos += 2
-    while pos < len(bs):
-        pos, prev_d = decode_relative(bs, pos, prev_d)
-        solution_line.append(apply_direction(solution_line[-1], prev_d))
-    solution_line.append(exit_)
+    # a line of a single step already ends at the exit
+    if solution_line[-1] != exit_:
+        solution_line.append(exit_)
 
-    all_sublines = {(x, y) for x, y in zip(solution_line[:-1], solution_line[1:])}
+    bitboard = get_bitboard(width, height)
+    computed_values = bitboard.triangle_values(bitboard.edges_mask(solution_line))
 
     triangle_values = []
-    for i in range(height):
-        for j in range(width):
-            computed = get_triangle_value(i, j, all_sublines)
-            triangle_values.append(computed if bs[triangle_pos + i * width + j] == "0" else 0)
+    cell_bit = 1 << (width * height)
+    for row in computed_values:
+        for computed in row:
+            cell_bit >>= 1
+            triangle_values.append(0 if hidden & cell_bit else computed)
 
     return width, height, start, exit_, triangle_values, solution_line
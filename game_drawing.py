@@ -7,7 +7,8 @@ from PIL import Image, ImageDraw
 from arcade.experimental.lights import Light, LightLayer
 
 import config as cfg
-from models import Board, Node, get_triangle_value
+from metrics import timed
+from models import Board, Node
 
 Coords = Tuple[float, float]
 
@@ -155,33 +156,16 @@ class GameDrawing:
         self.light_layer.set_background_color(cfg.bg_color[cfg.theme])
 
     def get_cell_coords(self) -> List[List[Coords]]:
-        coords = []
-        curr_y = self.bottom_left_y + cfg.lane_width
-        for j in range(self.board.height):
-            coords.append([])
-            curr_x = self.bottom_left_x + cfg.lane_width
-
-            for i in range(self.board.width):
-                coords[j].append((curr_x, curr_y))
-                curr_x += cfg.cell_size + cfg.lane_width
-
-            curr_y += cfg.cell_size + cfg.lane_width
-
-        return coords
+        return self.board.topology.get_grid_coords(0,
+                                                   self.bottom_left_x + cfg.lane_width,
+                                                   self.bottom_left_y + cfg.lane_width,
+                                                   cfg.cell_size + cfg.lane_width)
 
     def get_lines_coords(self) -> List[List[Coords]]:
-        coords = []
-        curr_y = self.bottom_left_y + (cfg.lane_width / 2)
-        for j in range(self.board.height + 1):
-            coords.append([])
-            curr_x = self.bottom_left_x + (cfg.lane_width / 2)
-
-            for i in range(self.board.width + 1):
-                coords[j].append((curr_x, curr_y))
-                curr_x += cfg.cell_size + cfg.lane_width
-
-            curr_y += cfg.cell_size + cfg.lane_width
-        return coords
+        return self.board.topology.get_grid_coords(1,
+                                                   self.bottom_left_x + cfg.lane_width / 2,
+                                                   self.bottom_left_y + cfg.lane_width / 2,
+                                                   cfg.cell_size + cfg.lane_width)
 
     def get_exit_data(self) -> Optional[GExitData]:
         x, y = self.board.exit
@@ -227,6 +211,7 @@ class GameDrawing:
         # middle of the board
         return
 
+    @timed('drawing.create_triangles')
     def create_triangles(self):
         self.triangles = []
         self.light_layer._lights = []
@@ -337,8 +322,10 @@ class GameDrawing:
                          font_size=cfg.help_tip_font_size, color=arcade.color.GOLD)
 
     def mark_wrong_triangles(self, line: List[Node]):
+        topology = self.board.topology
+        edges = topology.edges_mask(line)
         for triangle in self.triangles:
-            if triangle.num != get_triangle_value(triangle.cell_x, triangle.cell_y, line):
+            if triangle.num != topology.triangle_value(triangle.cell_x, triangle.cell_y, edges):
                 triangle.color = cfg.wrong_triangle_color
                 for light in triangle.lights:
                     light._color = cfg.wrong_triangle_color
@@ -357,6 +344,14 @@ class GameDrawing:
                          anchor_x='right', anchor_y='baseline',
                          font_size=cfg.help_tip_font_size, color=cfg.help_tip_color)
 
+    @staticmethod
+    def draw_generating_text():
+        arcade.draw_text('GENERATING PUZZLES...',
+                         cfg.window_width / 2,
+                         cfg.window_height / 2,
+                         anchor_x='center', anchor_y='center',
+                         font_size=cfg.popup_font_size, color=cfg.help_tip_color)
+
     @staticmethod
     def draw_selecting_lane_point():
         # todo tidy up coords
@@ -367,8 +362,11 @@ class GameDrawing:
                          font_size=cfg.help_tip_font_size, color=cfg.help_tip_color)
 
     @staticmethod
-    def draw_solution_info(current_solution: int, total_count: int, solution_length: int):
-        arcade.draw_text(f'{current_solution + 1}/{total_count} ({solution_length} long)',
+    def draw_solution_info(current_solution: int, total_count: int, solution_length: int,
+                           is_complete: bool = True):
+        # a trailing + means the solver is still looking for more
+        more = '' if is_complete else '+'
+        arcade.draw_text(f'{current_solution + 1}/{total_count}{more} ({solution_length} long)',
                          cfg.window_width * 0.2,
                          100,
                          anchor_x='center', anchor_y='center',
@@ -1,3 +1,5 @@
+import logging
+
 import arcade
 
 import config as cfg
@@ -30,8 +32,14 @@ class Triangles(arcade.Window):
     def on_update(self, delta_time: float):
         self.popup.update()
 
+    def on_close(self):
+        self.vm.close_views()
+        super().on_close()
+
 
 def main():
+    # search stats of path generation and solving
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     Triangles()
     arcade.run()
 
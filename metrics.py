@@ -0,0 +1,157 @@
+import atexit
+import bisect
+import functools
+import json
+import time
+from contextlib import nullcontext
+from typing import Dict, Optional, Sequence
+
+import core_config as cfg
+
+# upper bounds in milliseconds, one more bucket counts everything slower
+default_buckets = (0.1, 0.5, 1, 5, 10, 17, 33, 50, 100, 250, 500, 1000, 5000)
+
+
+class Histogram:
+    """Fixed-bucket histogram, updating it is a bisect and a few additions."""
+
+    def __init__(self, buckets: Sequence[float] = default_buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> dict:
+        if not self.count:
+            return {'count': 0}
+
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count,
+            'min': self.min,
+            'max': self.max,
+            'buckets': {f'le_{bound:g}': count for bound, count in zip(self.buckets, self.counts)},
+            'overflow': self.counts[-1],
+        }
+
+
+class Timer:
+    # context manager that records its duration in milliseconds into a histogram
+    __slots__ = ('histogram', 'time_start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.time_start = 0
+
+    def __enter__(self):
+        self.time_start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe((time.perf_counter_ns() - self.time_start) / 1e6)
+
+
+class Registry:
+    """In-process counters and timing histograms.
+
+    Timers and counters check `enabled` on every use, so while it is off
+    they cost one attribute lookup and record nothing."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.time_start = time.time()
+        self.disabled_timer = nullcontext()
+
+    def enable(self, path: Optional[str] = None):
+        # with a path the snapshot is also written there when the process exits
+        self.enabled = True
+        if path is not None:
+            atexit.register(self.write_snapshot, path)
+
+    def increment(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def get_histogram(self, name: str, buckets: Sequence[float] = default_buckets) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(buckets)
+        return histogram
+
+    def observe(self, name: str, value: float):
+        if self.enabled:
+            self.get_histogram(name).observe(value)
+
+    def timer(self, name: str):
+        if not self.enabled:
+            return self.disabled_timer
+        return Timer(self.get_histogram(name))
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+        self.time_start = time.time()
+
+    def snapshot(self) -> dict:
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'uptime': time.time() - self.time_start,
+            'counters': dict(self.counters),
+            # all timers are in milliseconds
+            'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+
+    def write_snapshot(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+registry = Registry()
+if cfg.metrics:
+    registry.enable(cfg.metrics_path)
+
+
+def timed(name: str):
+    """Records every call of the decorated function in the `name` histogram."""
+
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return f(*args, **kwargs)
+
+            with Timer(registry.get_histogram(name)):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def counted(name: str):
+    """Counts the calls of the decorated function in the `name` counter."""
+
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if registry.enabled:
+                registry.counters[name] = registry.counters.get(name, 0) + 1
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,35 +1,51 @@
+import logging
+import os
 import random
 import time
 from dataclasses import dataclass
-from typing import Tuple, List, Set, Optional
+from typing import Callable, Tuple, List, Set, Optional, Iterator, Sequence
 
-import config as cfg
+import core_config as cfg
+import vectorized
+from core_config import EngineConfig
+from difficulty import get_difficulty, get_concentration_difficulty_multiplier
 from encoding import ponchik_encode, ponchik_decode
+from metrics import counted, timed
+from path_cache import load_paths, save_paths
+from path_store import PathStore
+from sampler import LongPathSampler
+from search_stats import SearchStats
+from solver import Solver
+from topology import BoardTopology, get_topology
 
 Node = Tuple[int, int]
 FullPath = List[Node]
 
+# solution lines tried for a unique puzzle before create_puzzle gives up
+max_unique_puzzle_tries = 20
 
-def get_triangle_value(i: int, j: int, line: FullPath) -> int:
-    all_sublines = [(x, y) for x, y in zip(line[:-1], line[1:])]
-    corner_sw = (i, j)
-    corner_nw = (i + 1, j)
-    corner_ne = (i + 1, j + 1)
-    corner_se = (i, j + 1)
-    all_possible_neighbor_lines = {(corner_sw, corner_nw),
-                                   (corner_nw, corner_sw),
-                                   (corner_nw, corner_ne),
-                                   (corner_ne, corner_nw),
-                                   (corner_ne, corner_se),
-                                   (corner_se, corner_ne),
-                                   (corner_se, corner_sw),
-                                   (corner_sw, corner_se)}
+# nodes expanded between two checks of the time limit and the stop callback of
+# iter_paths, a subtree with no long enough paths may not reach the exit for long
+stop_check_interval = 1024
 
-    return len(all_possible_neighbor_lines.intersection(set(all_sublines)))
+
+def estimate_difficulties(triangle_grids: Sequence[List[List[int]]]) -> List[float]:
+    # difficulty of many triangle grids of the same size at once,
+    # the same numbers as Board.estimate_difficulty gives for each of them
+    if not triangle_grids:
+        return []
+
+    if vectorized.available:
+        return vectorized.score_difficulties(triangle_grids).tolist()
+
+    height = len(triangle_grids[0])
+    width = len(triangle_grids[0][0]) if height else 0
+    return [get_difficulty(triangle_values, width, height) for triangle_values in triangle_grids]
 
 
 class Board:
-    def __init__(self, width: int, height: int, bstart, bexit):
+    def __init__(self, width: int, height: int, bstart, bexit, config: Optional[EngineConfig] = None):
+        self.config = config or cfg.engine
         self.width = width
         self.height = height
 
@@ -51,75 +67,126 @@ class Board:
         self.triangle_values: List[List[int]] = [[0 for _ in range(self.width)] for _ in range(self.height)]
         self.solution_line: List[Node] = []
         self.pg: Optional[PathGenerator] = None
+        self.solver: Optional[Solver] = None
+        self.sampler: Optional[LongPathSampler] = None
         self.difficulty: int = 0
 
+    @property
+    def topology(self) -> BoardTopology:
+        return get_topology(self.width, self.height, self.start, self.exit)
+
+    @timed('board.generate_paths')
     def generate_paths(self, min_len=None):
         if min_len is None:
             min_len = self.width * self.height
 
-        self.pg = PathGenerator(self.width, self.height, self.start, self.exit)
-        self.pg.run(min_len)
+        pg = PathGenerator(self.width, self.height, self.start, self.exit, config=self.config)
+        if not pg.is_feasible(min_len):
+            raise RuntimeError(f'no path from {self.start} to {self.exit} can be {min_len} long')
+
+        if self.config.path_sampling and min_len > 0:
+            self.sampler = LongPathSampler(self.width, self.height, self.start, self.exit,
+                                           min_len, pg.obstacles)
+            return
+
+        self.pg = pg
+        layout = (self.width, self.height, self.start, self.exit, min_len, frozenset(pg.obstacles))
+        max_paths = self.config.max_paths_generated
+        if self.config.path_cache:
+            # a complete enumeration (max_paths 0) serves any cap, a capped run only the same cap
+            for cached_max_paths in (0, max_paths):
+                cached_paths = load_paths(layout + (cached_max_paths,), self.config.path_cache_dir)
+                if cached_paths is not None:
+                    self.pg.paths = cached_paths
+                    return
+
+        stats = self.pg.run(min_len)
         if not self.pg.paths:
             raise RuntimeError('no paths were generated')
 
+        # A run stopped by generation_time_limit holds however many paths this
+        # machine found in time, only complete or capped runs are reproducible.
+        if self.config.path_cache and stats.stop_reason in ('exhausted', 'max_paths'):
+            cache_key = layout + (0 if stats.stop_reason == 'exhausted' else max_paths,)
+            save_paths(cache_key, self.pg.paths, self.config.path_cache_dir, self.config.path_cache_max_bytes)
+
     def get_solution_line(self):
-        self.solution_line = self.pg.pick_random_path()
+        if self.sampler is not None:
+            self.solution_line = self.sampler.sample()
+        else:
+            self.solution_line = self.pg.pick_random_path()
 
     def find_triangle_values(self):
+        topology = self.topology
+        edges = topology.edges_mask(self.solution_line)
         self.triangle_values = []
         for i in range(self.height):
             self.triangle_values.append([])
 
             for j in range(self.width):
-                triangle_value = get_triangle_value(i, j, self.solution_line)
+                triangle_value = topology.triangle_value(i, j, edges)
                 # 0 means we're gonna hide this triangle
-                if random.random() < cfg.hide_triangle_probability:
+                if random.random() < self.config.hide_triangle_probability:
                     triangle_value = 0
                 self.triangle_values[i].append(triangle_value)
 
-    def check_solution(self, line: List[Node]) -> bool:
-        for i, row in enumerate(self.triangle_values):
-            for j, triangle_value in enumerate(row):
-                if triangle_value >= 1 and triangle_value != get_triangle_value(i, j, line):
-                    return False
+    def find_unique_triangle_values(self) -> bool:
+        # Starts from every triangle of the solution line and hides them one by one
+        # in random order, keeping a hide only if the puzzle still has one solution.
+        # Each triangle is tried with hide_triangle_probability, so the clue density
+        # stays close to find_triangle_values. Returns False if even the full
+        # set of triangles allows more than one solution.
+        self.triangle_values = self.topology.triangle_values(self.topology.edges_mask(self.solution_line))
+        if not self.has_unique_solution():
+            return False
+
+        cells = [(i, j) for i, row in enumerate(self.triangle_values)
+                 for j, triangle_value in enumerate(row) if triangle_value >= 1]
+        random.shuffle(cells)
+
+        for i, j in cells:
+            if random.random() >= self.config.hide_triangle_probability:
+                continue
+
+            triangle_value = self.triangle_values[i][j]
+            self.triangle_values[i][j] = 0
+            if not self.has_unique_solution():
+                self.triangle_values[i][j] = triangle_value
 
         return True
 
-    def estimate_difficulty(self):
-        triangles_count = len([x for row in self.triangle_values for x in row if x >= 1])
-        if self.width < 2 or self.height < 2 or triangles_count == 0:
-            self.difficulty = 0
+    @counted('board.create_puzzle')
+    def create_puzzle(self):
+        self.get_solution_line()
+        if not self.config.unique_solution_puzzles:
+            self.find_triangle_values()
             return
 
-        score = 0
-        concentration = triangles_count / (self.width * self.height)
+        # on some boards every line stays ambiguous even with all its triangles
+        # shown, or too expensive to prove unique within uniqueness_check_max_nodes
+        for _ in range(max_unique_puzzle_tries):
+            if self.find_unique_triangle_values():
+                return
+            self.get_solution_line()
 
-        # divide the entire board in 2x2 blocks
-        for i in range(self.height - 1):
-            for j in range(self.width - 1):
-                # too lazy to use numpy
-                unfiltered_block = (self.triangle_values[i][j:j + 2] +
-                                    self.triangle_values[i + 1][j:j + 2])
-                block = [x for x in unfiltered_block if x >= 1]
+        raise RuntimeError(f'no puzzle with a unique solution found in {max_unique_puzzle_tries} lines')
 
-                # 0 triangles - 1 score
-                # 1 triangle  - 2 score
-                # 2 triangles - 4 score
-                # 3 triangles - 8 score
-                # 4 triangles - 16 score
-                score += 2 ** len(block)
+    def check_solution(self, line: List[Node]) -> bool:
+        topology = self.topology
+        edges = topology.edges_mask(line)
+        for i, row in enumerate(self.triangle_values):
+            for j, triangle_value in enumerate(row):
+                if triangle_value >= 1 and triangle_value != topology.triangle_value(i, j, edges):
+                    return False
 
-        self.difficulty = score * self.get_concentration_difficulty_multiplier(concentration)
+        return True
+
+    def estimate_difficulty(self):
+        self.difficulty = get_difficulty(self.triangle_values, self.width, self.height)
 
     @staticmethod
     def get_concentration_difficulty_multiplier(conc: float) -> float:
-        # anything below or above the magic number will get lower multiplier
-        magic_conc_number = 0.75
-        if conc > magic_conc_number:
-            delta = conc - magic_conc_number
-            conc = magic_conc_number - delta
-
-        return conc / magic_conc_number
+        return get_concentration_difficulty_multiplier(conc)
 
     def generate_code(self, solution=None) -> str:
         if solution is None:
@@ -143,15 +210,51 @@ class Board:
         self.triangle_values = [t[i:i + w] for i in range(0, len(t), w)]
         self.solution_line = solution
 
+    def get_solver(self) -> Solver:
+        # the last solver stays on the board, its stats describe the last search
+        self.solver = Solver(self.topology, self.triangle_values, self.config.search_phase_timing)
+        return self.solver
+
+    @timed('board.solve')
     def solve(self) -> List[FullPath]:
+        solutions = list(self.iter_solutions())
+        solutions.sort(key=len)
+        self.solver.stats.log(f'solve {self.width}x{self.height} {self.start}->{self.exit}')
+        return solutions
+
+    def iter_solutions(self, pause_nodes: Optional[int] = None) -> Iterator[Optional[FullPath]]:
+        # solutions in the order the solver finds them, not sorted by length,
+        # with pause_nodes also None now and then, see Solver.solutions
+        return self.get_solver().solutions(pause_nodes=pause_nodes)
+
+    def first_solution(self, max_nodes: Optional[int] = None) -> Optional[FullPath]:
+        # with max_nodes, None can also mean that solver.gave_up
+        return next(self.get_solver().solutions(max_nodes=max_nodes), None)
+
+    def has_solution(self) -> bool:
+        return self.count_solutions(limit=1) > 0
+
+    def count_solutions(self, limit: Optional[int] = None) -> int:
+        count = self.get_solver().count(limit)
+        self.solver.stats.log(f'count solutions {self.width}x{self.height}', logging.DEBUG)
+        return count
+
+    def has_unique_solution(self) -> bool:
+        # too expensive to prove within the node budget counts as not unique
+        solver = self.get_solver()
+        unique = solver.count(limit=2, max_nodes=self.config.uniqueness_check_max_nodes) == 1 and not solver.gave_up
+        solver.stats.log(f'uniqueness check {self.width}x{self.height}', logging.DEBUG)
+        return unique
+
+    def solve_by_enumeration(self) -> List[FullPath]:
         if self.pg is None:
             self.generate_paths(min_len=0)
 
-        solutions = []
-
-        for path in self.pg.paths:
-            if self.check_solution(path):
-                solutions.append(path)
+        if vectorized.available:
+            matches = vectorized.match_triangles(self.topology, self.pg.paths, self.triangle_values)
+            solutions = [self.pg.paths[i] for i in matches.nonzero()[0]]
+        else:
+            solutions = [path for path in self.pg.paths if self.check_solution(path)]
 
         solutions.sort(key=len)
         return solutions
@@ -163,44 +266,66 @@ class Board:
 
 
 class PathGenerator:
-    def __init__(self, w: int, h: int, start: Node, end: Node):
+    def __init__(self, w: int, h: int, start: Node, end: Node, obstacles: Optional[Set[Node]] = None,
+                 config: Optional[EngineConfig] = None):
+        self.config = config or cfg.engine
         self.w = w
         self.h = h
         self.start = start
         self.end = end
 
-        self.obstacles = self.add_obstacles(cfg.obstacles_count)
-        self.paths: List[FullPath] = []
+        if obstacles is None:
+            obstacles = self.add_obstacles(self.config.obstacles_count)
+        self.obstacles = obstacles
+        self.paths = PathStore(start)
+        self.topology = get_topology(w, h, start, end, frozenset(self.obstacles))
+        self.stats = SearchStats()
+
+    def run(self, min_len: int, iterative: bool = True, prune: bool = True) -> SearchStats:
+        time_end = time.time() + self.config.generation_time_limit
+        max_paths = self.config.max_paths_generated
+
+        # 0 means one worker per core
+        workers = self.config.generation_workers or os.cpu_count() or 1
+
+        if workers > 1:
+            # imported here, the parallel module itself depends on this one
+            from parallel import run_parallel
+
+            self.stats = SearchStats()
+            stop_reason = run_parallel(self, min_len, workers, max_paths, time_end, prune)
+            self.stats.finish(stop_reason)
+        elif iterative:
+            for path in self.iter_paths(min_len, time_end, prune):
+                self.paths.append(path)
 
-    def run(self, min_len: int):
-        total_path_count = 0
-        suitable_paths_count = 0
-        time_end = time.time() + cfg.generation_time_limit
-        explored_all_paths = True
+                if len(self.paths) >= max_paths:
+                    break
 
-        for path in self.dfs_paths(self.start):
-            total_path_count += 1
+            if len(self.paths) >= max_paths:
+                self.stats.finish('max_paths')
+        else:
+            self.stats = SearchStats()
+            stop_reason = 'exhausted'
+            for path in self.dfs_paths(self.start):
+                self.stats.paths_yielded += 1
 
-            if len(path) >= min_len:
-                self.paths.append(path)
-                suitable_paths_count += 1
+                if len(path) >= min_len:
+                    self.paths.append(path)
 
-            if suitable_paths_count >= cfg.max_paths_generated:
-                explored_all_paths = False
-                break
+                if len(self.paths) >= max_paths:
+                    stop_reason = 'max_paths'
+                    break
 
-            if time.time() > time_end:
-                print(f'time limit exceeded ({cfg.generation_time_limit}s)')
-                explored_all_paths = False
-                break
+                if time.time() > time_end:
+                    stop_reason = 'time_limit'
+                    break
 
-        gen_text = f'generated {suitable_paths_count} suitable paths'
+            self.stats.finish(stop_reason)
 
-        if explored_all_paths:
-            print(f'total path count: {total_path_count}')
-            print(f'{gen_text} ({(suitable_paths_count / total_path_count):.1%})')
-        else:
-            print(gen_text)
+        self.stats.paths_accepted = len(self.paths)
+        self.stats.log(f'path generation {self.w}x{self.h} {self.start}->{self.end}')
+        return self.stats
 
     def dfs_paths(self, start: Node, path=None):
         if path is None:
@@ -211,11 +336,117 @@ class PathGenerator:
         for field in self.get_candidates(start, path):
             yield from self.dfs_paths(field, path + [field])
 
-    def get_neighbors(self, node: Node) -> Set[Node]:
-        x, y = node
-        all_neighbors = [(x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1)]
+    def iter_paths(self, min_len: int, time_end: float = float('inf'),
+                   prune: bool = False, prefix: Optional[FullPath] = None,
+                   should_stop: Optional[Callable[[], bool]] = None) -> Iterator[FullPath]:
+        # Same search as dfs_paths, but with an explicit stack of candidate lists
+        # and a single path buffer that is grown and shrunk in place.
+        # Only the paths that are long enough get copied out.
+        # With a prefix only the subtree below it is searched.
+        # The search ends early once should_stop returns True.
+        # self.stats is replaced with the stats of this search.
+        stats = self.stats = SearchStats()
+        timing = self.config.search_phase_timing
+        perf_counter = time.perf_counter
+
+        path = list(prefix) if prefix else [self.start]
+        node_bits = self.topology.node_bits
+        end_bit = node_bits[self.end]
+        all_nodes = self.topology.all_nodes_mask
+        visited = self.topology.nodes_mask(path) | self.topology.obstacles_mask
+        stack = [self.get_free_neighbors(path[-1], visited)]
+        stats.max_depth = len(path)
+        stop_reason = 'stopped'
+
+        try:
+            while stack:
+                candidates = stack[-1]
+                if not candidates:
+                    stack.pop()
+                    visited &= ~node_bits[path.pop()]
+                    continue
+
+                field = candidates.pop()
+                if field == self.end:
+                    stats.paths_yielded += 1
+                    if len(path) + 1 >= min_len:
+                        path.append(field)
+                        stats.paths_accepted += 1
+                        yield list(path)
+                        path.pop()
+
+                    if time.time() > time_end:
+                        stop_reason = 'time_limit'
+                        return
+
+                    continue
+
+                field_bit = node_bits[field]
+                if prune:
+                    if timing:
+                        time_start = perf_counter()
+
+                    # every way on from here goes through the nodes connected to
+                    # the field, so the exit has to be among them and the longest
+                    # line through them allowed by the colour parity has to make min_len
+                    reachable = self.topology.flood(field_bit, all_nodes & ~visited)
+                    if not reachable & end_bit:
+                        pruned_by = 'exit_unreachable'
+                    elif len(path) + self.topology.longest_path_bound(field, self.end, reachable) < min_len:
+                        pruned_by = 'too_short'
+                    else:
+                        pruned_by = None
+
+                    if timing:
+                        stats.add_phase_time('pruning', perf_counter() - time_start)
+
+                    if pruned_by is not None:
+                        stats.prune(pruned_by)
+                        continue
+
+                path.append(field)
+                visited |= field_bit
+                stats.nodes_expanded += 1
+                if len(path) > stats.max_depth:
+                    stats.max_depth = len(path)
+
+                if not stats.nodes_expanded % stop_check_interval:
+                    if time.time() > time_end:
+                        stop_reason = 'time_limit'
+                        return
+                    if should_stop is not None and should_stop():
+                        return
+
+                if timing:
+                    time_start = perf_counter()
+                    stack.append(self.get_free_neighbors(field, visited))
+                    stats.add_phase_time('candidates', perf_counter() - time_start)
+                else:
+                    stack.append(self.get_free_neighbors(field, visited))
+
+            stop_reason = 'exhausted'
+        finally:
+            # also runs when the caller stops asking for paths
+            stats.finish(stop_reason)
+
+    def is_feasible(self, min_len: int) -> bool:
+        # a cheap check that rules out hopeless (start, exit, min_len) combinations
+        # before spending the whole time limit on them; passing it does not
+        # guarantee that a path exists
+        free = self.topology.all_nodes_mask & ~self.topology.obstacles_mask
+        reachable = self.topology.flood(self.topology.node_bits[self.start], free)
+        if not reachable & self.topology.node_bits[self.end]:
+            return False
+
+        return self.topology.longest_path_bound(self.start, self.end, reachable) >= min_len
+
+    def get_free_neighbors(self, node: Node, visited: int) -> List[Node]:
+        result = [neighbor for neighbor, bit in self.topology.neighbor_bits[node] if not visited & bit]
+        random.shuffle(result)
+        return result
 
-        return {(x, y) for x, y in all_neighbors if 0 <= x <= self.h and 0 <= y <= self.w}
+    def get_neighbors(self, node: Node) -> Set[Node]:
+        return set(self.topology.neighbors[node])
 
     def get_candidates(self, start: Node, path: FullPath) -> List[Node]:
         result = list(self.get_neighbors(start) - set(path) - self.obstacles)
@@ -293,6 +524,30 @@ def compare_generated_paths():
         print(f'there is {len(paths_a - paths_b)} paths A that dont exist in paths B')
 
 
+def compare_solvers():
+    x = 4
+    for _ in range(20):
+        board = Board(x, x, (0, 0), None)
+        board.generate_paths()
+        board.get_solution_line()
+        board.find_triangle_values()
+
+        # fresh board for the enumeration, the one above only holds long paths
+        reference = Board(x, x, (0, 0), None)
+        reference.triangle_values = board.triangle_values
+
+        time_start = time.time()
+        solutions_a = board.solve()
+        time_a = time.time() - time_start
+        solutions_b = reference.solve_by_enumeration()
+        time_b = time.time() - time_start - time_a
+
+        paths_a = set(tuple(path) for path in solutions_a)
+        paths_b = set(tuple(path) for path in solutions_b)
+        status = 'equal' if paths_a == paths_b else 'DIFFERENT'
+        print(f'{len(paths_a)} solutions, {status}, solver {time_a:.3f}s, enumeration {time_b:.3f}s')
+
+
 if __name__ == '__main__':
     # board = Board(width=2, height=2)
 
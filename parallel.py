@@ -0,0 +1,130 @@
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Optional, Set
+
+from core_config import EngineConfig
+from models import PathGenerator, Node, FullPath
+from search_stats import SearchStats
+
+# how many paths a worker sends back at once
+batch_size = 256
+
+# set in every worker process by init_worker
+results_queue: Optional[multiprocessing.Queue] = None
+stop_event = None
+
+
+def init_worker(queue_, event):
+    global results_queue, stop_event
+    results_queue = queue_
+    stop_event = event
+
+
+def split_prefixes(pg: PathGenerator, min_count: int, max_depth: int = 10) -> Tuple[List[FullPath], List[FullPath]]:
+    # Walks the search tree breadth-first until there are enough open prefixes
+    # to spread over the workers. Prefixes that already reached the exit
+    # are complete paths and are returned separately.
+    prefixes = [[pg.start]]
+    finished = []
+
+    for _ in range(max_depth):
+        if len(prefixes) >= min_count:
+            break
+
+        longer_prefixes = []
+        for prefix in prefixes:
+            for field in pg.topology.neighbors[prefix[-1]]:
+                if field in prefix or field in pg.obstacles:
+                    continue
+
+                if field == pg.end:
+                    finished.append(prefix + [field])
+                else:
+                    longer_prefixes.append(prefix + [field])
+
+        prefixes = longer_prefixes
+
+    return prefixes, finished
+
+
+def enumerate_prefix(w: int, h: int, start: Node, end: Node, obstacles: Set[Node], config: EngineConfig,
+                     prefix: FullPath, min_len: int, time_end: float, prune: bool) -> SearchStats:
+    pg = PathGenerator(w, h, start, end, obstacles, config)
+    batch = []
+
+    # the main process sets stop_event once it has enough paths
+    for path in pg.iter_paths(min_len, time_end, prune, prefix, stop_event.is_set):
+        batch.append(path)
+        if len(batch) >= batch_size:
+            results_queue.put(batch)
+            batch = []
+
+    results_queue.put(batch)
+    # marks the end of this subtree, the main process counts these
+    results_queue.put(None)
+    return pg.stats
+
+
+def run_parallel(pg: PathGenerator, min_len: int, workers: int, max_paths: int,
+                 time_end: float, prune: bool = True) -> str:
+    """Enumerates the paths of `pg` over a process pool, one task per path prefix,
+    appending them to pg.paths and merging the stats of the workers into pg.stats.
+    Returns why the search stopped."""
+    prefixes, finished = split_prefixes(pg, workers * 4)
+    pg.paths += [path for path in finished if len(path) >= min_len][:max_paths]
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    stop = context.Event()
+    tasks_left = len(prefixes)
+    stop_reason = 'exhausted'
+
+    with ProcessPoolExecutor(workers, mp_context=context,
+                             initializer=init_worker, initargs=(results, stop)) as executor:
+        futures = [executor.submit(enumerate_prefix, pg.w, pg.h, pg.start, pg.end, pg.obstacles, pg.config,
+                                   prefix, min_len, time_end, prune)
+                   for prefix in prefixes]
+
+        while tasks_left and len(pg.paths) < max_paths:
+            if time.time() > time_end:
+                stop_reason = 'time_limit'
+                break
+
+            try:
+                batch = results.get(timeout=0.05)
+            except queue.Empty:
+                # a crashed task never sends its end marker
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        stop.set()
+                        raise future.exception()
+                continue
+
+            if batch is None:
+                tasks_left -= 1
+            else:
+                pg.paths += batch[:max_paths - len(pg.paths)]
+
+        if tasks_left:
+            if stop_reason == 'exhausted':
+                stop_reason = 'max_paths'
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        # the queue has to be drained, otherwise workers blocked on a full pipe never finish
+        while tasks_left:
+            try:
+                if results.get(timeout=0.05) is None:
+                    tasks_left -= 1
+            except queue.Empty:
+                if all(future.done() for future in futures):
+                    break
+
+    pg.stats.paths_yielded += len(finished)
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            pg.stats.merge(future.result())
+
+    return stop_reason
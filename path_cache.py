@@ -0,0 +1,144 @@
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+import sys
+from typing import Optional, FrozenSet, Tuple
+
+import core_config as cfg
+from path_store import PathStore
+from topology import Node
+
+# File layout, all in native byte order (recorded in the header):
+#   header      magic, version, byte order, width, height, start, exit, min_len,
+#               max_paths, obstacles count, paths count, data size
+#               max_paths is 0 for a complete enumeration, else the file is partial:
+#               the first max_paths paths found by a run capped at max_paths_generated
+#   obstacles   2 bytes per obstacle
+#   offsets     4 bytes per path, start of the path in the data section
+#   lengths     2 bytes per path, node count, padded to 4 bytes
+#   data        2-bit steps as stored by PathStore
+magic = b'TRPC'
+# 2: only complete enumerations are saved, files of version 1 may hold a cut-short run
+# 3: runs capped by max_paths_generated are saved too, keyed and marked by the cap
+version = 3
+header_format = '=4sHB6BHIHII'
+# sections after the header start at multiples of 4 bytes
+header_size = (struct.calcsize(header_format) + 3) // 4 * 4
+byte_order = 0 if sys.byteorder == 'little' else 1
+
+# width, height, start, exit, min_len, obstacles, max_paths
+CacheKey = Tuple[int, int, Node, Node, int, FrozenSet[Node], int]
+
+
+def get_cache_path(key: CacheKey, cache_dir: str) -> str:
+    w, h, start, exit_, min_len, obstacles, max_paths = key
+    text = f'{w} {h} {start} {exit_} {min_len} {sorted(obstacles)} {max_paths}'
+    name = hashlib.sha1(text.encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, f'{w}x{h}-{name}.paths')
+
+
+def pad4(size: int) -> int:
+    return (size + 3) // 4 * 4
+
+
+def save_paths(key: CacheKey, store: PathStore, cache_dir: str, max_bytes: int):
+    w, h, start, exit_, min_len, obstacles, max_paths = key
+    count = len(store)
+    header = struct.pack(header_format, magic, version, byte_order, w, h, *start, *exit_,
+                         min_len, max_paths, len(obstacles), count, len(store.data))
+    obstacles_bytes = bytes(itertools.chain.from_iterable(sorted(obstacles)))
+    lengths_bytes = store.lengths.tobytes()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = get_cache_path(key, cache_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(header_size, b'\0'))
+        f.write(obstacles_bytes.ljust(pad4(len(obstacles_bytes)), b'\0'))
+        f.write(store.offsets.tobytes())
+        f.write(lengths_bytes.ljust(pad4(len(lengths_bytes)), b'\0'))
+        f.write(store.data)
+
+    # readers never see a half-written file
+    os.replace(tmp_path, path)
+    evict_old_files(cache_dir, max_bytes)
+
+
+def load_paths(key: CacheKey, cache_dir: str) -> Optional[PathStore]:
+    path = get_cache_path(key, cache_dir)
+    try:
+        with open(path, 'rb') as f:
+            # the mapping stays valid after the file is closed
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if len(buffer) < header_size:
+        return None
+
+    (file_magic, file_version, file_byte_order, w, h, sx, sy, ex, ey, min_len, max_paths,
+     obstacles_count, count, data_size) = struct.unpack_from(header_format, buffer)
+    if (file_magic, file_version, file_byte_order) != (magic, version, byte_order):
+        return None
+
+    obstacles_end = header_size + 2 * obstacles_count
+    obstacles = frozenset(zip(buffer[header_size:obstacles_end:2], buffer[header_size + 1:obstacles_end:2]))
+    # a hash collision would show up as a different key
+    if (w, h, (sx, sy), (ex, ey), min_len, obstacles, max_paths) != key:
+        return None
+
+    view = memoryview(buffer)
+    offsets_start = header_size + pad4(2 * obstacles_count)
+    offsets_end = offsets_start + 4 * count
+    lengths_end = offsets_end + pad4(2 * count)
+    store = PathStore.from_buffers(key[2], view[lengths_end:lengths_end + data_size],
+                                   view[offsets_start:offsets_end].cast('I'),
+                                   view[offsets_end:offsets_end + 2 * count].cast('H'))
+
+    # the modification time doubles as the last use time for eviction
+    os.utime(path)
+    return store
+
+
+def evict_old_files(cache_dir: str, max_bytes: int):
+    files = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith('.paths'):
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total_size <= max_bytes:
+            break
+        os.remove(path)
+        total_size -= size
+
+
+def warm_cache(max_width: int = cfg.max_board_width, time_limit: float = 60.0):
+    # Fills the cache for every board size up to max_width and every
+    # start/exit pair, with the min_len and max_paths_generated used by
+    # Board.generate_paths. A run stopped by the time limit is not saved,
+    # time_limit is the game's generation_time_limit raised so that every
+    # run gets to either the end of the enumeration or the cap.
+    # Imported here because models uses this module.
+    from models import Board
+
+    config = cfg.engine.replace(generation_time_limit=time_limit)
+
+    for w in range(1, max_width + 1):
+        for h in range(1, max_width + 1):
+            nodes = list(itertools.product(range(h + 1), range(w + 1)))
+            for start, exit_ in itertools.permutations(nodes, 2):
+                board = Board(w, h, start, exit_, config=config)
+                try:
+                    board.generate_paths()
+                except RuntimeError as e:
+                    print(f'{w}x{h} {start}->{exit_}: {e}')
+
+
+if __name__ == '__main__':
+    warm_cache(int(sys.argv[1]) if len(sys.argv) > 1 else cfg.max_board_width)
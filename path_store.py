@@ -0,0 +1,91 @@
+from array import array
+from typing import Iterable, Iterator, List
+
+from topology import Node
+
+FullPath = List[Node]
+
+# same order as the ponchik codec directions
+directions = ((0, 1), (0, -1), (1, 0), (-1, 0))
+direction_codes = {d: i for i, d in enumerate(directions)}
+
+# the four 2-bit directions packed in every byte value, first step in the lowest bits
+byte_directions = [tuple(directions[(byte >> shift) & 3] for shift in (0, 2, 4, 6)) for byte in range(256)]
+
+
+class PathStore:
+    """Compact list of paths that all start at the same node.
+
+    Each path is stored as 2-bit steps packed into one shared bytearray,
+    with an offsets table pointing at the first byte of every path.
+    Tuple paths are only built when a path is read back."""
+
+    def __init__(self, start: Node, paths: Iterable[FullPath] = ()):
+        self.start = start
+        self.data = bytearray()
+        self.offsets = array('I')
+        # node count of every path
+        self.lengths = array('H')
+        self.extend(paths)
+
+    @staticmethod
+    def from_buffers(start: Node, data: memoryview, offsets: memoryview, lengths: memoryview) -> 'PathStore':
+        # read-only store over existing buffers, e.g. a memory-mapped cache file
+        store = PathStore(start)
+        store.data = data
+        store.offsets = offsets
+        store.lengths = lengths
+        return store
+
+    def append(self, path: FullPath):
+        assert path[0] == self.start
+        self.offsets.append(len(self.data))
+        self.lengths.append(len(path))
+
+        byte = 0
+        shift = 0
+        for a, b in zip(path[:-1], path[1:]):
+            byte |= direction_codes[(b[0] - a[0], b[1] - a[1])] << shift
+            shift += 2
+            if shift == 8:
+                self.data.append(byte)
+                byte = 0
+                shift = 0
+
+        if shift:
+            self.data.append(byte)
+
+    def extend(self, paths: Iterable[FullPath]):
+        for path in paths:
+            self.append(path)
+
+    def __iadd__(self, paths: Iterable[FullPath]) -> 'PathStore':
+        self.extend(paths)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> FullPath:
+        steps = self.lengths[i] - 1
+        offset = self.offsets[i]
+        x, y = self.start
+        path = [self.start]
+
+        for byte in self.data[offset:offset + (steps + 3) // 4]:
+            for dx, dy in byte_directions[byte]:
+                if len(path) > steps:
+                    break
+                x += dx
+                y += dy
+                path.append((x, y))
+
+        return path
+
+    def __iter__(self) -> Iterator[FullPath]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self) -> int:
+        return (len(self.data) + self.offsets.itemsize * len(self.offsets) +
+                self.lengths.itemsize * len(self.lengths))
@@ -0,0 +1,95 @@
+import queue
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from core_config import EngineConfig
+from models import Board, Node
+from puzzle_bank import PuzzleBank
+
+# live puzzles generated while looking for one in the difficulty range
+max_generation_tries = 50
+
+
+@dataclass
+class Puzzle:
+    triangle_values: List[List[int]]
+    solution_line: List[Node]
+    difficulty: float
+
+
+class PuzzlePrefetcher:
+    """Keeps a bounded queue of ready-made puzzles for one board layout,
+    filled by a background thread so the render thread never has to wait
+    for path generation. With a difficulty range, puzzles come from the
+    puzzle bank first and live generation only takes over once it runs out."""
+
+    def __init__(self, width: int, height: int, bstart, bexit, size: int,
+                 difficulty_range: Optional[Tuple[float, float]] = None, config: Optional[EngineConfig] = None):
+        self.board = Board(width=width, height=height, bstart=bstart, bexit=bexit, config=config)
+        self.difficulty_range = difficulty_range
+        self.puzzles: queue.Queue = queue.Queue(maxsize=size)
+        self.stopped = threading.Event()
+        self.error: Optional[Exception] = None
+        self.thread = threading.Thread(target=self.work, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def work(self):
+        # any error ends the thread, PlayView shows it once the queue runs dry
+        try:
+            self.fill_queue()
+        except Exception as e:
+            self.error = e
+
+    def fill_queue(self):
+        if self.difficulty_range is not None:
+            bank = PuzzleBank(self.board.width, self.board.height, self.board.start, self.board.exit,
+                              self.board.config)
+            code = bank.draw(*self.difficulty_range)
+            while code is not None and self.put_board_puzzle(code):
+                code = bank.draw(*self.difficulty_range)
+
+        self.board.generate_paths()
+        while self.put_board_puzzle():
+            pass
+
+    def put_board_puzzle(self, code: Optional[str] = None) -> bool:
+        if code is not None:
+            self.board.load_custom_puzzle(code)
+            self.board.estimate_difficulty()
+        else:
+            self.generate_puzzle()
+
+        puzzle = Puzzle(self.board.triangle_values, self.board.solution_line, self.board.difficulty)
+        while not self.stopped.is_set():
+            try:
+                self.puzzles.put(puzzle, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def generate_puzzle(self):
+        # without a bank, hitting the difficulty range is down to luck,
+        # so after a few tries any puzzle will do
+        for _ in range(max_generation_tries):
+            self.board.create_puzzle()
+            self.board.estimate_difficulty()
+            if self.difficulty_range is None:
+                return
+
+            min_difficulty, max_difficulty = self.difficulty_range
+            if min_difficulty <= self.board.difficulty <= max_difficulty:
+                return
+
+    def get(self) -> Optional[Puzzle]:
+        try:
+            return self.puzzles.get_nowait()
+        except queue.Empty:
+            return None
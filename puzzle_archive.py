@@ -0,0 +1,254 @@
+import base64
+import bisect
+import heapq
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from encoding import BitReader, decode_geometry
+from topology import Node
+
+# An archive is two append-only files and a side index, all in native byte order
+# (recorded in the headers):
+#   NAME.records   header, then per puzzle a 2-byte length and the raw ponchik payload,
+#                  the bytes a puzzle code is the base64 of
+#   NAME.index     header, then one fixed-width entry per puzzle: record offset,
+#                  width, height, start, exit, difficulty and solution count
+#   NAME.sorted    header, then a (difficulty, entry number) pair per puzzle sorted by
+#                  difficulty, brought up to date by the next difficulty lookup
+# Appending a puzzle adds one record and one entry to the ends of the files.
+magic = b'TRPA'
+version = 1
+header_format = '=4sHB'
+# 8 so that the index entries after the header stay aligned
+header_size = 8
+record_length_format = '=H'
+record_length_size = struct.calcsize(record_length_format)
+# difficulty is kept 8-byte aligned, the index is scanned as an array of doubles
+entry_format = '=Q6BxxdI4x'
+entry_size = struct.calcsize(entry_format)
+entry_doubles = entry_size // 8
+difficulty_position = 2
+sorted_entry_format = '=dQ'
+sorted_entry_size = struct.calcsize(sorted_entry_format)
+byte_order = 0 if sys.byteorder == 'little' else 1
+# entries read at once by the streaming iterator and the sorted index updates
+chunk_entries = 65536
+
+
+class ArchiveEntry(NamedTuple):
+    width: int
+    height: int
+    start: Node
+    exit: Node
+    difficulty: float
+    solutions_count: int
+    # a view into the mapped file, valid as long as the entry is referenced
+    payload: memoryview
+
+    @property
+    def code(self) -> str:
+        # the puzzle code as Board.generate_code makes it
+        return base64.b64encode(self.payload).decode()
+
+
+def get_archive_paths(path: str) -> Tuple[str, str, str]:
+    return f'{path}.records', f'{path}.index', f'{path}.sorted'
+
+
+def read_header(f, file_path: str):
+    header = f.read(header_size)
+    file_magic, file_version, file_byte_order = struct.unpack_from(header_format, header)
+    if (file_magic, file_version, file_byte_order) != (magic, version, byte_order):
+        raise ValueError(f'{file_path} is not a puzzle archive of this version and byte order')
+
+
+def iter_sorted_entries(f) -> Iterator[Tuple[float, int]]:
+    f.seek(header_size)
+    chunk = f.read(chunk_entries * sorted_entry_size)
+    while chunk:
+        yield from struct.iter_unpack(sorted_entry_format, chunk)
+        chunk = f.read(chunk_entries * sorted_entry_size)
+
+
+def pack_entry(offset: int, payload: bytes, difficulty: float, solutions_count: int) -> bytes:
+    # the geometry is read back from the payload itself
+    width, height, start, exit_ = decode_geometry(BitReader(payload, len(payload) * 8))
+    return struct.pack(entry_format, offset, width, height, *start, *exit_, difficulty, solutions_count)
+
+
+def unpack_entry(entry: bytes, payload: memoryview) -> ArchiveEntry:
+    _, width, height, sx, sy, ex, ey, difficulty, solutions_count = struct.unpack(entry_format, entry)
+    return ArchiveEntry(width, height, (sx, sy), (ex, ey), difficulty, solutions_count, payload)
+
+
+class PuzzleArchive:
+    """Puzzles of any board layout with their difficulty and solution count.
+
+    The files are read through mmap, looking up a puzzle by number reads
+    one index entry and one record without copying the payload. The
+    mappings are renewed when the files have grown, also by another process."""
+
+    def __init__(self, path: str):
+        self.records_path, self.index_path, self.sorted_path = get_archive_paths(path)
+        header = struct.pack(header_format, magic, version, byte_order).ljust(header_size, b'\0')
+        if not os.path.exists(self.index_path):
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            for file_path in (self.records_path, self.index_path):
+                with open(file_path, 'wb') as f:
+                    f.write(header)
+        # an empty side index is filled in by the first difficulty lookup
+        if not os.path.exists(self.sorted_path):
+            with open(self.sorted_path, 'wb') as f:
+                f.write(header)
+
+        for file_path in (self.records_path, self.index_path, self.sorted_path):
+            with open(file_path, 'rb') as f:
+                read_header(f, file_path)
+
+        self.records: Optional[mmap.mmap] = None
+        self.index: Optional[mmap.mmap] = None
+        self.sorted: Optional[mmap.mmap] = None
+
+    def __len__(self) -> int:
+        return (os.path.getsize(self.index_path) - header_size) // entry_size
+
+    def map_files(self, count: int):
+        # an mmap does not see bytes appended after it was made
+        if self.index is None or len(self.index) < header_size + count * entry_size:
+            with open(self.index_path, 'rb') as f:
+                self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with open(self.records_path, 'rb') as f:
+                self.records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def append(self, code: str, difficulty: float, solutions_count: int):
+        self.extend([(difficulty, solutions_count, code)])
+
+    def extend(self, entries: Iterable[Tuple[float, int, str]]):
+        # the same (difficulty, solution count, code) triples as a PuzzleBank holds
+        with open(self.records_path, 'ab') as records, open(self.index_path, 'ab') as index:
+            offset = records.tell()
+            records_data = bytearray()
+            index_data = bytearray()
+            for difficulty, solutions_count, code in entries:
+                payload = base64.b64decode(code)
+                index_data += pack_entry(offset + len(records_data), payload, difficulty, solutions_count)
+                records_data += struct.pack(record_length_format, len(payload))
+                records_data += payload
+
+            # records first, an index entry never points past the end of the records
+            records.write(records_data)
+            records.flush()
+            index.write(index_data)
+
+    def get_payload(self, offset: int) -> memoryview:
+        length, = struct.unpack_from(record_length_format, self.records, offset)
+        start = offset + record_length_size
+        return memoryview(self.records)[start:start + length]
+
+    def __getitem__(self, i: int) -> ArchiveEntry:
+        count = len(self)
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError('puzzle archive index out of range')
+
+        self.map_files(i + 1)
+        entry_start = header_size + i * entry_size
+        entry = self.index[entry_start:entry_start + entry_size]
+        offset, = struct.unpack_from('=Q', entry)
+        return unpack_entry(entry, self.get_payload(offset))
+
+    def update_sorted_index(self, count: int):
+        # adds the index entries from the one after the last sorted entry up to count
+        sorted_count = (os.path.getsize(self.sorted_path) - header_size) // sorted_entry_size
+        if sorted_count >= count:
+            return
+
+        self.map_files(count)
+        doubles = memoryview(self.index)[header_size:header_size + count * entry_size].cast('d')
+        difficulties = doubles[sorted_count * entry_doubles + difficulty_position::entry_doubles].tolist()
+        new_entries = sorted(zip(difficulties, range(sorted_count, count)))
+
+        last = None
+        if sorted_count:
+            with open(self.sorted_path, 'rb') as f:
+                f.seek(header_size + (sorted_count - 1) * sorted_entry_size)
+                last = struct.unpack(sorted_entry_format, f.read(sorted_entry_size))
+
+        # puzzles added in difficulty order only need appending, else the
+        # sorted files are merged into a new one that replaces the old
+        if last is None or last <= new_entries[0]:
+            with open(self.sorted_path, 'ab') as f:
+                f.write(b''.join(struct.pack(sorted_entry_format, *entry) for entry in new_entries))
+            return
+
+        tmp_path = f'{self.sorted_path}.{os.getpid()}.tmp'
+        with open(self.sorted_path, 'rb') as old, open(tmp_path, 'wb') as f:
+            f.write(old.read(header_size))
+            data = bytearray()
+            for entry in heapq.merge(iter_sorted_entries(old), new_entries):
+                data += struct.pack(sorted_entry_format, *entry)
+                if len(data) >= chunk_entries * sorted_entry_size:
+                    f.write(data)
+                    data.clear()
+            f.write(data)
+        os.replace(tmp_path, self.sorted_path)
+
+    def find(self, min_difficulty: float, max_difficulty: float) -> Iterator[int]:
+        """Numbers of the puzzles within the difficulty range, in difficulty order.
+
+        Two binary searches in the sorted side index, after it has been
+        brought up to date with the puzzles added since the last lookup."""
+        self.update_sorted_index(len(self))
+
+        size = os.path.getsize(self.sorted_path)
+        if self.sorted is None or len(self.sorted) != size:
+            with open(self.sorted_path, 'rb') as f:
+                self.sorted = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        pairs = memoryview(self.sorted)[header_size:size - (size - header_size) % sorted_entry_size]
+        difficulties = pairs.cast('d')[0::2]
+        numbers = pairs.cast('Q')[1::2]
+        lo = bisect.bisect_left(difficulties, min_difficulty)
+        hi = bisect.bisect_right(difficulties, max_difficulty)
+        for first in range(lo, hi, chunk_entries):
+            yield from numbers[first:min(first + chunk_entries, hi)].tolist()
+
+    def __iter__(self) -> Iterator[ArchiveEntry]:
+        # reads both files front to back with plain buffered reads,
+        # only one chunk of the index is in memory at a time
+        count = len(self)
+        with open(self.index_path, 'rb') as index, open(self.records_path, 'rb') as records:
+            index.seek(header_size)
+            position = 0
+            for first in range(0, count, chunk_entries):
+                chunk = index.read(min(chunk_entries, count - first) * entry_size)
+                for entry_start in range(0, len(chunk), entry_size):
+                    entry = chunk[entry_start:entry_start + entry_size]
+                    # records of an interrupted extend have no index entry, skip past them
+                    offset, = struct.unpack_from('=Q', entry)
+                    if offset != position:
+                        records.seek(offset)
+                    length, = struct.unpack(record_length_format, records.read(record_length_size))
+                    position = offset + record_length_size + length
+                    yield unpack_entry(entry, memoryview(records.read(length)))
+
+
+def main():
+    # usage: python puzzle_archive.py ARCHIVE BANK_FILE..., adds the puzzles of puzzle bank files
+    archive = PuzzleArchive(sys.argv[1])
+    for bank_path in sys.argv[2:]:
+        entries: List[Tuple[float, int, str]] = []
+        with open(bank_path) as f:
+            for line in f:
+                difficulty, solutions_count, code = line.split()
+                entries.append((float(difficulty), int(solutions_count), code))
+        archive.extend(entries)
+    print(f'{len(archive)} puzzles in {archive.index_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import bisect
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Set, Tuple, Optional
+
+import core_config as cfg
+from core_config import EngineConfig
+from models import Board, Node
+
+# solution counting stops here, very open puzzles are stored with this count
+max_counted_solutions = 1000
+# puzzles generated per pool task
+chunk_size = 50
+
+BankEntry = Tuple[float, int, str]
+
+
+def get_bank_path(w: int, h: int, start: Node, exit_: Node, bank_dir: str) -> str:
+    return os.path.join(bank_dir, f'{w}x{h}-{start[0]}_{start[1]}-{exit_[0]}_{exit_[1]}.bank')
+
+
+def generate_entries(w: int, h: int, bstart, bexit, count: int, config: EngineConfig) -> List[BankEntry]:
+    # forked workers start with the same random state
+    random.seed()
+    board = Board(w, h, bstart, bexit, config)
+    board.generate_paths()
+
+    entries = []
+    for _ in range(count):
+        board.create_puzzle()
+        board.estimate_difficulty()
+        entries.append((board.difficulty, board.count_solutions(max_counted_solutions), board.generate_code()))
+
+    return entries
+
+
+def build_bank(w: int, h: int, bstart, bexit, count: int, workers: int = 0,
+               config: Optional[EngineConfig] = None):
+    """Generates `count` puzzles for one board layout on all cores and adds them to its bank file."""
+    board = Board(w, h, bstart, bexit, config)
+    bank = PuzzleBank(w, h, board.start, board.exit, board.config)
+
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as executor:
+        futures = [executor.submit(generate_entries, w, h, board.start, board.exit,
+                                   min(chunk_size, count - i), board.config)
+                   for i in range(0, count, chunk_size)]
+        for future in futures:
+            bank.add(future.result())
+
+    bank.save()
+    print(f'{len(bank.entries)} puzzles in {bank.path}, {bank.count_remaining(len(bank.entries))} not drawn yet')
+
+
+class PuzzleBank:
+    """Puzzle codes of one board layout kept sorted by difficulty.
+
+    Drawn codes are appended to NAME.bank.drawn and never handed out again,
+    also not after a restart or a rebuild of the bank."""
+
+    def __init__(self, w: int, h: int, start: Node, exit_: Node, config: Optional[EngineConfig] = None):
+        self.config = config or cfg.engine
+        self.path = get_bank_path(w, h, start, exit_, self.config.puzzle_bank_dir)
+        self.drawn_path = f'{self.path}.drawn'
+        self.entries: List[BankEntry] = []
+        self.difficulties: List[float] = []
+        self.drawn: Set[str] = set()
+        # Fenwick tree over the entry positions counting the entries not drawn yet
+        self.remaining: List[int] = [0]
+
+        if os.path.exists(self.drawn_path):
+            with open(self.drawn_path) as f:
+                self.drawn.update(line.strip() for line in f)
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    difficulty, solutions_count, code = line.split()
+                    self.entries.append((float(difficulty), int(solutions_count), code))
+            self.add([])
+
+    def add(self, entries: List[BankEntry]):
+        self.entries += entries
+        self.entries.sort()
+        self.difficulties = [entry[0] for entry in self.entries]
+
+        count = len(self.entries)
+        self.remaining = [0] * (count + 1)
+        for i, (_, _, code) in enumerate(self.entries, 1):
+            if code not in self.drawn:
+                self.remaining[i] += 1
+            parent = i + (i & -i)
+            if parent <= count:
+                self.remaining[parent] += self.remaining[i]
+
+    def save(self):
+        os.makedirs(self.config.puzzle_bank_dir, exist_ok=True)
+        with open(self.path, 'w') as f:
+            for difficulty, solutions_count, code in self.entries:
+                f.write(f'{difficulty}\t{solutions_count}\t{code}\n')
+
+    def count_remaining(self, end: int) -> int:
+        # entries not drawn yet among the first `end`
+        count = 0
+        while end > 0:
+            count += self.remaining[end]
+            end -= end & -end
+        return count
+
+    def find_remaining(self, k: int) -> int:
+        # position of the entry not drawn yet with k such entries before it
+        position = 0
+        step = 1 << (len(self.remaining) - 1).bit_length()
+        while step:
+            if position + step < len(self.remaining) and self.remaining[position + step] <= k:
+                position += step
+                k -= self.remaining[position]
+            step >>= 1
+        return position
+
+    def draw(self, min_difficulty: float, max_difficulty: float) -> Optional[str]:
+        # a random puzzle within the range not drawn before, O(log n)
+        lo = bisect.bisect_left(self.difficulties, min_difficulty)
+        hi = bisect.bisect_right(self.difficulties, max_difficulty)
+        skipped = self.count_remaining(lo)
+        available = self.count_remaining(hi) - skipped
+        if available <= 0:
+            return None
+
+        i = self.find_remaining(skipped + random.randrange(available))
+        position = i + 1
+        while position < len(self.remaining):
+            self.remaining[position] -= 1
+            position += position & -position
+
+        code = self.entries[i][2]
+        self.drawn.add(code)
+        os.makedirs(self.config.puzzle_bank_dir, exist_ok=True)
+        with open(self.drawn_path, 'a') as f:
+            f.write(f'{code}\n')
+        return code
+
+
+def main():
+    # usage: python puzzle_bank.py WIDTH HEIGHT COUNT, start and exit come from the config
+    w, h, count = map(int, sys.argv[1:4])
+    build_bank(w, h, cfg.board_start, cfg.board_exit, count)
+
+
+if __name__ == '__main__':
+    main()
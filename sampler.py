@@ -0,0 +1,130 @@
+import random
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+from topology import get_topology, Node
+
+FullPath = List[Node]
+
+
+class LongPathSampler:
+    """Random long lines between start and exit without enumerating them.
+
+    Keeps a single line and rewires it with local moves that never touch
+    the ends: a segment is pushed out into two free nodes next to it (+2),
+    a detour is cut short (-2), a corner is flipped, or two parallel
+    segments of a unit square are swapped by reversing the part of the
+    line between them (backbite-style). Every sample continues the same
+    chain, so memory stays constant and there is no start-up phase.
+    """
+
+    def __init__(self, w: int, h: int, start: Node, end: Node, min_len: int,
+                 obstacles: Optional[Set[Node]] = None, mixing_steps: int = 0):
+        self.topology = get_topology(w, h, start, end, frozenset(obstacles or ()))
+        self.start = start
+        self.end = end
+        self.min_len = min_len
+        # moves between two samples, by default a few per node of the board
+        self.mixing_steps = mixing_steps or 10 * len(self.topology.node_bits)
+        self.moves = (self.extend, self.shorten, self.flip_corner, self.swap_square)
+
+        self.path: FullPath = self.find_shortest_path()
+        self.positions: Dict[Node, int] = {}
+        self.update_positions()
+
+    def find_shortest_path(self) -> FullPath:
+        previous = {self.start: self.start}
+        queue = deque([self.start])
+        while queue:
+            node = queue.popleft()
+            if node == self.end:
+                break
+            for neighbor in self.topology.neighbors[node]:
+                if neighbor not in previous and neighbor not in self.topology.obstacles:
+                    previous[neighbor] = node
+                    queue.append(neighbor)
+
+        if self.end not in previous:
+            raise RuntimeError('exit cannot be reached from start')
+
+        path = [self.end]
+        while path[-1] != self.start:
+            path.append(previous[path[-1]])
+
+        return path[::-1]
+
+    def update_positions(self):
+        self.positions = {node: i for i, node in enumerate(self.path)}
+
+    def is_free(self, node: Node) -> bool:
+        return (node in self.topology.node_bits and node not in self.positions
+                and node not in self.topology.obstacles)
+
+    def sample(self, max_steps: int = 100000) -> FullPath:
+        steps = 0
+        mixed = 0
+        while len(self.path) < self.min_len or mixed < self.mixing_steps:
+            if steps == max_steps:
+                raise RuntimeError('no paths were generated')
+
+            random.choice(self.moves)(random.randrange(len(self.path) - 1))
+            steps += 1
+            if len(self.path) >= self.min_len:
+                mixed += 1
+
+        return list(self.path)
+
+    def extend(self, i: int):
+        a, b = self.path[i], self.path[i + 1]
+        # the two sideways directions of the segment a-b
+        dx, dy = b[1] - a[1], b[0] - a[0]
+        for side in random.sample(((dx, dy), (-dx, -dy)), 2):
+            c = (a[0] + side[0], a[1] + side[1])
+            d = (b[0] + side[0], b[1] + side[1])
+            if self.is_free(c) and self.is_free(d):
+                self.path[i + 1:i + 1] = [c, d]
+                self.update_positions()
+                return
+
+    def shorten(self, i: int):
+        # only keep the line long enough once it got there
+        if i + 3 >= len(self.path) or len(self.path) - 2 < self.min_len <= len(self.path):
+            return
+
+        a, d = self.path[i], self.path[i + 3]
+        if abs(a[0] - d[0]) + abs(a[1] - d[1]) == 1:
+            del self.path[i + 1:i + 3]
+            self.update_positions()
+
+    def flip_corner(self, i: int):
+        if i + 2 >= len(self.path):
+            return
+
+        a, b, c = self.path[i], self.path[i + 1], self.path[i + 2]
+        if a[0] == c[0] or a[1] == c[1]:
+            return
+
+        d = (a[0] + c[0] - b[0], a[1] + c[1] - b[1])
+        if self.is_free(d):
+            self.path[i + 1] = d
+            del self.positions[b]
+            self.positions[d] = i + 1
+
+    def swap_square(self, i: int):
+        a, b = self.path[i], self.path[i + 1]
+        dx, dy = b[1] - a[1], b[0] - a[0]
+        side = random.choice(((dx, dy), (-dx, -dy)))
+        c = (a[0] + side[0], a[1] + side[1])
+        d = (b[0] + side[0], b[1] + side[1])
+        k = self.positions.get(c)
+        if k is None or self.positions.get(d) != k + 1:
+            return
+
+        # a-b and c-d run the same way along the line, reconnecting them
+        # as a-c and b-d means reversing everything in between
+        lo, hi = min(i, k), max(i, k)
+        if hi <= lo + 1:
+            return
+
+        self.path[lo + 1:hi + 1] = self.path[lo + 1:hi + 1][::-1]
+        self.update_positions()
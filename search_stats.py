@@ -0,0 +1,72 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+
+logger = logging.getLogger('triangles.search')
+
+
+@dataclass
+class SearchStats:
+    """What one path generation or solver run cost and why it stopped.
+
+    For path generation a yielded path is any line that reached the exit
+    and an accepted one is long enough to keep. For the solver they are
+    the lines that reached the exit and the ones that match the triangles."""
+
+    nodes_expanded: int = 0
+    paths_yielded: int = 0
+    paths_accepted: int = 0
+    # branches cut off before being expanded, by reason
+    pruned: Dict[str, int] = field(default_factory=dict)
+    # longest partial line in nodes
+    max_depth: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    # exhausted, max_paths, time_limit, max_nodes, limit or stopped
+    stop_reason: str = ''
+    # seconds spent per phase of the search, only with search_phase_timing
+    phase_times: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        # cpu time of merged searches from other processes
+        self.merged_cpu_time = 0.0
+
+    def prune(self, reason: str):
+        self.pruned[reason] = self.pruned.get(reason, 0) + 1
+
+    def add_phase_time(self, phase: str, seconds: float):
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+
+    def finish(self, stop_reason: str):
+        self.stop_reason = stop_reason
+        self.wall_time = time.perf_counter() - self.wall_start
+        self.cpu_time = time.process_time() - self.cpu_start + self.merged_cpu_time
+
+    def merge(self, other: 'SearchStats'):
+        # adds a search that ran alongside this one, e.g. in a worker process
+        self.nodes_expanded += other.nodes_expanded
+        self.paths_yielded += other.paths_yielded
+        self.paths_accepted += other.paths_accepted
+        for reason, count in other.pruned.items():
+            self.pruned[reason] = self.pruned.get(reason, 0) + count
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.merged_cpu_time += other.cpu_time
+        self.cpu_time += other.cpu_time
+        for phase, seconds in other.phase_times.items():
+            self.add_phase_time(phase, seconds)
+
+    def __str__(self) -> str:
+        text = (f'{self.nodes_expanded} nodes, {self.paths_yielded} yielded, {self.paths_accepted} accepted, '
+                f'max depth {self.max_depth}, {self.wall_time:.3f}s wall, {self.cpu_time:.3f}s cpu, '
+                f'stopped: {self.stop_reason}')
+        if self.pruned:
+            text += ', pruned ' + ', '.join(f'{reason} {count}' for reason, count in sorted(self.pruned.items()))
+        if self.phase_times:
+            text += ', ' + ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in sorted(self.phase_times.items()))
+        return text
+
+    def log(self, label: str, level: int = logging.INFO):
+        logger.log(level, '%s: %s', label, self)
@@ -0,0 +1,162 @@
+import time
+from typing import List, Dict, Tuple, Iterator, Optional
+
+from search_stats import SearchStats
+from topology import BoardTopology, Node, Cell
+
+FullPath = List[Node]
+
+
+class Solver:
+    """Depth-first search over start->exit lines that prunes
+    a branch as soon as some visible triangle can no longer be satisfied."""
+
+    def __init__(self, topology: BoardTopology, triangle_values: List[List[int]], phase_timing: bool = False):
+        self.topology = topology
+        self.phase_timing = phase_timing
+        self.start = topology.start
+        self.exit = topology.exit
+        self.exit_bit = topology.node_bits[topology.exit]
+        self.neighbor_bits = topology.neighbor_bits
+
+        # only the visible triangles constrain the line
+        self.targets: Dict[Cell, int] = {(i, j): value
+                                         for i, row in enumerate(triangle_values)
+                                         for j, value in enumerate(row) if value >= 1}
+
+        # constrained cells on either side of each edge
+        self.edge_cells: Dict[Tuple[Node, Node], List[Cell]] = {
+            edge: [cell for cell in cells if cell in self.targets]
+            for edge, cells in topology.edge_cells.items()}
+        # for each constrained cell, both end nodes of each of its edges as one mask
+        self.cell_edge_ends: Dict[Cell, List[int]] = {
+            cell: [topology.node_bits[a] | topology.node_bits[b] for a, b in topology.cell_edges[cell]]
+            for cell in self.targets}
+
+        self.used: Dict[Cell, int] = {}
+        self.visited = 0
+        self.path: FullPath = []
+        self.copy = True
+        self.max_nodes: Optional[int] = None
+        self.pause_nodes: Optional[int] = None
+        self.stats = SearchStats()
+
+    def solutions(self, copy: bool = True, max_nodes: Optional[int] = None,
+                  pause_nodes: Optional[int] = None) -> Iterator[Optional[FullPath]]:
+        # Without copying, every solution is the solver's own path buffer
+        # and is only valid until the next one is requested.
+        # With max_nodes the search gives up after expanding that many nodes
+        # and sets gave_up, so the solutions found are not necessarily all of them.
+        # With pause_nodes None is yielded after every that many expanded nodes,
+        # so the caller gets control back even while no solutions turn up.
+        # self.stats is replaced with the stats of this search.
+        self.stats = SearchStats()
+        self.max_nodes = max_nodes
+        self.pause_nodes = pause_nodes
+        self.used = {cell: 0 for cell in self.targets}
+        self.visited = self.topology.node_bits[self.start]
+        self.path = [self.start]
+        self.stats.max_depth = 1
+        self.copy = copy
+
+        stop_reason = 'stopped'
+        try:
+            yield from self.extend()
+            stop_reason = self.stats.stop_reason or 'exhausted'
+        finally:
+            # also runs when the caller stops asking for solutions
+            self.stats.finish(stop_reason)
+
+    @property
+    def gave_up(self) -> bool:
+        return self.stats.stop_reason == 'max_nodes'
+
+    def count(self, limit: Optional[int] = None, max_nodes: Optional[int] = None) -> int:
+        count = 0
+        solutions = self.solutions(copy=False, max_nodes=max_nodes)
+        for _ in solutions:
+            count += 1
+            if count == limit:
+                solutions.close()
+                self.stats.finish('limit')
+                break
+
+        return count
+
+    def extend(self) -> Iterator[Optional[FullPath]]:
+        path = self.path
+        stats = self.stats
+        pause_nodes = self.pause_nodes
+        head = path[-1]
+        if head == self.exit:
+            stats.paths_yielded += 1
+            if all(self.used[cell] == value for cell, value in self.targets.items()):
+                stats.paths_accepted += 1
+                yield list(path) if self.copy else path
+            return
+
+        for field, field_bit in self.neighbor_bits[head]:
+            if self.visited & field_bit:
+                continue
+
+            if stats.nodes_expanded == self.max_nodes:
+                stats.stop_reason = 'max_nodes'
+                return
+            stats.nodes_expanded += 1
+            if pause_nodes is not None and not stats.nodes_expanded % pause_nodes:
+                yield None
+
+            cells = self.edge_cells[(head, field)]
+            for cell in cells:
+                self.used[cell] += 1
+            self.visited |= field_bit
+            path.append(field)
+            if len(path) > stats.max_depth:
+                stats.max_depth = len(path)
+
+            if self.phase_timing:
+                time_start = time.perf_counter()
+                feasible = self.is_feasible(field_bit, cells)
+                stats.add_phase_time('pruning', time.perf_counter() - time_start)
+            else:
+                feasible = self.is_feasible(field_bit, cells)
+
+            if feasible:
+                yield from self.extend()
+
+            path.pop()
+            self.visited &= ~field_bit
+            for cell in cells:
+                self.used[cell] -= 1
+
+    def is_feasible(self, head_bit: int, changed_cells: List[Cell]) -> bool:
+        for cell in changed_cells:
+            if self.used[cell] > self.targets[cell]:
+                self.stats.prune('triangle_exceeded')
+                return False
+
+        if head_bit == self.exit_bit:
+            return True
+
+        # whatever is left of the line runs through the unvisited nodes
+        # connected to the head, so the exit has to be among them and every
+        # unsatisfied triangle needs enough edges with both ends among them
+        reachable = self.topology.flood(head_bit, (self.topology.all_nodes_mask & ~self.visited) | head_bit)
+        if not reachable & self.exit_bit:
+            self.stats.prune('exit_unreachable')
+            return False
+
+        for cell, target in self.targets.items():
+            missing = target - self.used[cell]
+            if missing <= 0:
+                continue
+
+            for ends in self.cell_edge_ends[cell]:
+                if ends & reachable == ends:
+                    missing -= 1
+
+            if missing > 0:
+                self.stats.prune('triangle_unreachable')
+                return False
+
+        return True
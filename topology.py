@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple, FrozenSet
+
+from bitboard import BitBoard, Node
+
+Cell = Tuple[int, int]
+Coords = Tuple[float, float]
+
+
+class BoardTopology(BitBoard):
+    """Geometry tables of one board layout, computed once and shared
+    by the path generator, the solver, the codec and the drawing code.
+    Use get_topology() rather than creating these directly."""
+
+    def __init__(self, width: int, height: int, start: Node, exit_: Node,
+                 obstacles: FrozenSet[Node] = frozenset()):
+        super().__init__(width, height)
+        self.start = start
+        self.exit = exit_
+        self.obstacles = obstacles
+        self.obstacles_mask = self.nodes_mask(list(obstacles))
+
+        self.neighbors: Dict[Node, List[Node]] = {}
+        self.neighbor_bits: Dict[Node, List[Tuple[Node, int]]] = {}
+        # cells having the node as one of their corners
+        self.node_cells: Dict[Node, List[Cell]] = {}
+        for x, y in self.node_bits:
+            self.neighbors[(x, y)] = [node for node in ((x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1))
+                                      if node in self.node_bits]
+            self.neighbor_bits[(x, y)] = [(node, self.node_bits[node]) for node in self.neighbors[(x, y)]]
+            self.node_cells[(x, y)] = [(i, j) for i, j in ((x - 1, y - 1), (x - 1, y), (x, y - 1), (x, y))
+                                       if 0 <= i < height and 0 <= j < width]
+
+        # cells on either side of each edge, keyed by both directions
+        self.edge_cells: Dict[Tuple[Node, Node], List[Cell]] = {}
+        for a, b in self.edges:
+            cells = [cell for cell in self.node_cells[a] if cell in self.node_cells[b]]
+            self.edge_cells[(a, b)] = cells
+            self.edge_cells[(b, a)] = cells
+
+        # the four edges of each cell, anticlockwise from the west side
+        self.cell_edges: Dict[Cell, List[Tuple[Node, Node]]] = {}
+        for i in range(height):
+            for j in range(width):
+                sw, nw, ne, se = (i, j), (i + 1, j), (i + 1, j + 1), (i, j + 1)
+                self.cell_edges[(i, j)] = [(sw, nw), (nw, ne), (ne, se), (se, sw)]
+
+        self.grid_coords: Dict[Tuple[int, float, float, float], List[List[Coords]]] = {}
+
+    def get_grid_coords(self, extra: int, left: float, bottom: float, step: float) -> List[List[Coords]]:
+        # screen coordinates of a (height + extra) x (width + extra) grid,
+        # extra=1 gives the lane points and extra=0 gives the cells
+        key = (extra, left, bottom, step)
+        if key not in self.grid_coords:
+            self.grid_coords[key] = [[(left + j * step, bottom + i * step) for j in range(self.w + extra)]
+                                     for i in range(self.h + extra)]
+
+        return self.grid_coords[key]
+
+
+@lru_cache(maxsize=64)
+def get_topology(width: int, height: int, start: Node, exit_: Node,
+                 obstacles: FrozenSet[Node] = frozenset()) -> BoardTopology:
+    return BoardTopology(width, height, start, exit_, obstacles)
@@ -0,0 +1,143 @@
+import importlib.util
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+from bitboard import BitBoard, FullPath
+from difficulty import magic_concentration
+from path_store import PathStore
+
+# Everything here is optional, callers fall back to the pure Python versions
+# when NumPy is missing. The functions import it themselves, it takes longer
+# to import than the rest of the engine.
+available = importlib.util.find_spec('numpy') is not None
+
+# paths converted to a matrix at once, bounds the memory of match_triangles
+chunk_size = 4096
+
+
+@lru_cache(maxsize=64)
+def get_edge_cell_matrix(bitboard: BitBoard) -> 'np.ndarray':
+    import numpy as np
+
+    # one row per edge, one column per cell in row-major order,
+    # 1 where the edge is a side of the cell
+    cell_masks = [mask for row in bitboard.cell_masks for mask in row]
+    matrix = np.zeros((len(bitboard.edges), len(cell_masks)), dtype=np.float32)
+    for e in range(len(bitboard.edges)):
+        for c, mask in enumerate(cell_masks):
+            if mask >> e & 1:
+                matrix[e, c] = 1
+
+    return matrix
+
+
+def get_path_edge_matrix(bitboard: BitBoard, paths: Sequence[FullPath]) -> 'np.ndarray':
+    import numpy as np
+
+    # one row per path, 1 for every edge the path uses
+    edges_count = len(bitboard.edges)
+    row_bytes = (edges_count + 7) // 8
+    data = b''.join(bitboard.edges_mask(path).to_bytes(row_bytes, 'little') for path in paths)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(paths), row_bytes),
+                         axis=1, bitorder='little')
+    return bits[:, :edges_count].astype(np.float32)
+
+
+@lru_cache(maxsize=64)
+def get_edge_index_table(bitboard: BitBoard) -> 'np.ndarray':
+    import numpy as np
+
+    # edge number of every (node, node) pair in both directions, by node bit index
+    nodes_count = len(bitboard.node_bits)
+    table = np.full(nodes_count * nodes_count, -1, dtype=np.int64)
+    for e, (a, b) in enumerate(bitboard.edges):
+        a_index = bitboard.node_bits[a].bit_length() - 1
+        b_index = bitboard.node_bits[b].bit_length() - 1
+        table[a_index * nodes_count + b_index] = e
+        table[b_index * nodes_count + a_index] = e
+
+    return table
+
+
+def get_store_edge_matrix(bitboard: BitBoard, store: PathStore, first: int, last: int) -> 'np.ndarray':
+    import numpy as np
+
+    # Same as get_path_edge_matrix for paths first..last-1 of a PathStore,
+    # but the nodes are rebuilt from the packed 2-bit steps without
+    # turning the paths into tuples first.
+    offsets = np.asarray(store.offsets[first:last], dtype=np.int64)
+    steps_counts = np.asarray(store.lengths[first:last], dtype=np.int64) - 1
+    # only the bytes of these paths are unpacked, 4 steps per byte
+    data_start = offsets.min()
+    data_end = (offsets + (steps_counts + 3) // 4).max()
+    offsets -= data_start
+    data = np.frombuffer(store.data, dtype=np.uint8)[data_start:data_end]
+    codes = np.stack([(data >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1).reshape(-1)
+
+    path_ids = np.repeat(np.arange(last - first), steps_counts)
+    steps_start = np.cumsum(steps_counts) - steps_counts
+    steps_in_path = np.arange(len(path_ids)) - np.repeat(steps_start, steps_counts)
+    path_codes = codes[np.repeat(offsets * 4, steps_counts) + steps_in_path]
+
+    # node bit index change of every direction in path_store.directions
+    row = bitboard.w + 1
+    deltas = np.array([1, -1, row, -row], dtype=np.int64)[path_codes]
+    moved = np.cumsum(deltas)
+    moved -= np.repeat(moved[steps_start - 1] * (steps_start > 0), steps_counts)
+    start_index = bitboard.node_bits[store.start].bit_length() - 1
+    heads = start_index + moved
+    tails = heads - deltas
+
+    matrix = np.zeros((last - first, len(bitboard.edges)), dtype=np.float32)
+    edge_ids = get_edge_index_table(bitboard)[tails * len(bitboard.node_bits) + heads]
+    matrix[path_ids, edge_ids] = 1
+    return matrix
+
+
+def match_triangles(bitboard: BitBoard, paths: Union[PathStore, Sequence[FullPath]],
+                    triangle_values: List[List[int]]) -> 'np.ndarray':
+    """Boolean mask of the paths that satisfy every visible triangle.
+
+    The triangle values of all paths come from one product of the
+    path-edge matrix with the edge-cell matrix per chunk of paths."""
+    import numpy as np
+
+    if not len(paths):
+        return np.zeros(0, dtype=bool)
+
+    targets = np.array(triangle_values, dtype=np.float32).reshape(-1)
+    visible = targets >= 1
+    edge_cells = get_edge_cell_matrix(bitboard)[:, visible]
+    targets = targets[visible]
+
+    masks = []
+    for first in range(0, len(paths), chunk_size):
+        last = min(first + chunk_size, len(paths))
+        if isinstance(paths, PathStore):
+            path_edges = get_store_edge_matrix(bitboard, paths, first, last)
+        else:
+            path_edges = get_path_edge_matrix(bitboard, paths[first:last])
+        masks.append((path_edges @ edge_cells == targets).all(axis=1))
+
+    return np.concatenate(masks)
+
+
+def score_difficulties(triangle_grids) -> 'np.ndarray':
+    """Difficulty of a stack of triangle grids shaped (count, height, width),
+    computed like difficulty.get_difficulty with a sliding 2x2 block sum."""
+    import numpy as np
+
+    shown = np.asarray(triangle_grids) >= 1
+    count, height, width = shown.shape
+    triangles_counts = shown.sum(axis=(1, 2))
+    if width < 2 or height < 2:
+        return np.zeros(count)
+
+    shown = shown.astype(np.int64)
+    block_counts = shown[:, :-1, :-1] + shown[:, :-1, 1:] + shown[:, 1:, :-1] + shown[:, 1:, 1:]
+    scores = np.left_shift(1, block_counts).sum(axis=(1, 2))
+
+    concentrations = triangles_counts / (width * height)
+    concentrations = np.where(concentrations > magic_concentration,
+                              magic_concentration - (concentrations - magic_concentration), concentrations)
+    return np.where(triangles_counts > 0, scores * (concentrations / magic_concentration), 0.0)
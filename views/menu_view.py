@@ -2,6 +2,7 @@ import arcade
 
 import config as cfg
 from game_drawing import MenuOption
+from metrics import timed
 
 
 class MenuView(arcade.View):
@@ -19,6 +20,7 @@ class MenuView(arcade.View):
         self.window.help.texts = []
         arcade.set_background_color(cfg.menu_bg_color)
 
+    @timed('menu.on_draw')
     def on_draw(self):
         self.clear()
         for option in self.options:
@@ -8,7 +8,9 @@ import pyperclip
 
 import config as cfg
 from game_drawing import GameDrawing
+from metrics import timed
 from models import Board, Node, PuzzleStats
+from prefetch import PuzzlePrefetcher
 
 
 class PlayView(arcade.View):
@@ -20,12 +22,17 @@ class PlayView(arcade.View):
                            bstart=cfg.board_start,
                            bexit=cfg.board_exit)
 
+        self.prefetcher: Optional[PuzzlePrefetcher] = None
         if custom_puzzle_code is not None:
             self.is_custom_puzzle = True
             self.board.load_custom_puzzle(custom_puzzle_code)
         else:
             self.is_custom_puzzle = False
-            self.board.generate_paths()
+            self.prefetcher = PuzzlePrefetcher(cfg.board_width, cfg.board_height,
+                                               cfg.board_start, cfg.board_exit,
+                                               cfg.prefetch_queue_size,
+                                               cfg.puzzle_difficulty_range)
+            self.prefetcher.start()
 
         self.gd = GameDrawing(self.board)
 
@@ -51,6 +58,7 @@ class PlayView(arcade.View):
         self.was_solution_shown = False
         self.was_given_space_warning = False
         self.puzzle_stats: List[PuzzleStats] = []
+        self.is_waiting_for_puzzle = False
 
         self.start_new_puzzle()
 
@@ -72,11 +80,25 @@ class PlayView(arcade.View):
     def on_hide_view(self):
         self.ui.disable()
 
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+
+    @timed('play.start_new_puzzle')
     def start_new_puzzle(self):
-        if not self.is_custom_puzzle:
-            self.board.get_solution_line()
-            self.board.find_triangle_values()
-        self.board.estimate_difficulty()
+        if self.is_custom_puzzle:
+            self.board.estimate_difficulty()
+        else:
+            puzzle = self.prefetcher.get()
+            if puzzle is None:
+                # on_update keeps asking until the prefetcher has one ready
+                self.is_waiting_for_puzzle = True
+                return
+
+            self.is_waiting_for_puzzle = False
+            self.board.triangle_values = puzzle.triangle_values
+            self.board.solution_line = puzzle.solution_line
+            self.board.difficulty = puzzle.difficulty
         self.gd.create_triangles()
 
         self.is_show_solution = False
@@ -92,6 +114,7 @@ class PlayView(arcade.View):
         self.was_solution_shown = False
         self.was_given_space_warning = False
 
+    @timed('play.on_draw')
     def on_draw(self):
         self.clear()
 
@@ -105,6 +128,8 @@ class PlayView(arcade.View):
         self.ui.draw()
         if self.is_custom_puzzle:
             self.gd.draw_custom_puzzle_text()
+        if self.is_waiting_for_puzzle:
+            self.gd.draw_generating_text()
 
     def is_line_present(self) -> bool:
         return len(self.line) > 1
@@ -113,6 +138,13 @@ class PlayView(arcade.View):
         return self.hints and not self.is_show_solution and not self.is_solved
 
     def on_update(self, delta_time: float):
+        if self.is_waiting_for_puzzle:
+            if self.prefetcher.error is not None:
+                self.is_waiting_for_puzzle = False
+                self.window.popup.set(f'Cannot generate puzzles: {self.prefetcher.error}')
+            else:
+                self.start_new_puzzle()
+
         self.gd.is_line_present = self.is_line_present()
         self.gd.is_solved = self.is_solved
 
@@ -139,6 +171,8 @@ class PlayView(arcade.View):
         if symbol == arcade.key.ESCAPE:
             self.display_final_stats()
             self.window.vm.show_menu_view()
+        elif self.is_waiting_for_puzzle:
+            return
         elif symbol == arcade.key.H:
             self.was_solution_shown = True
             self.is_show_solution = not self.is_show_solution
@@ -238,5 +272,8 @@ class PlayView(arcade.View):
                   f'{(sum(x.difficulty for x in self.puzzle_stats) / puzzles_solved):.1f}')
 
     def open_in_solver(self, _event=None):
+        if self.is_waiting_for_puzzle:
+            return
+
         code = self.board.generate_code()
         self.window.vm.show_solve_view_with_custom_puzzle(code)
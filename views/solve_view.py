@@ -1,5 +1,6 @@
 import math
-from typing import Tuple, List, Optional
+import time
+from typing import Tuple, List, Optional, Iterator
 
 import arcade
 import arcade.gui
@@ -7,6 +8,7 @@ import pyperclip
 
 import config as cfg
 from game_drawing import GameDrawing
+from metrics import timed
 from models import Board, FullPath
 
 
@@ -40,6 +42,9 @@ class SolveView(arcade.View):
         self.is_selecting_start = False
         self.is_selecting_exit = False
         self.solutions: List[FullPath] = []
+        self.solutions_left: Optional[Iterator[Optional[FullPath]]] = None
+        # every solution has been found
+        self.solutions_complete = False
         self.current_solution = 0
         self.mouse_x = 0
         self.mouse_y = 0
@@ -86,6 +91,8 @@ class SolveView(arcade.View):
     def reset_solutions(self):
         self.remove_top_panel()
         self.solutions = []
+        self.solutions_left = None
+        self.solutions_complete = False
         self.current_solution = 0
 
     def on_show_view(self):
@@ -105,6 +112,7 @@ class SolveView(arcade.View):
     def on_hide_view(self):
         self.ui.disable()
 
+    @timed('solve.on_draw')
     def on_draw(self):
         self.clear()
 
@@ -130,7 +138,37 @@ class SolveView(arcade.View):
             self.gd.draw_selecting_lane_point()
         if self.solutions:
             self.gd.draw_solution_info(self.current_solution, len(self.solutions),
-                                       len(self.solutions[self.current_solution]) - 1)
+                                       len(self.solutions[self.current_solution]) - 1,
+                                       is_complete=self.solutions_complete)
+
+    def on_update(self, delta_time: float):
+        if self.solutions_left is not None:
+            self.collect_more_solutions()
+
+    def collect_more_solutions(self):
+        # keep searching in small slices so the window stays responsive,
+        # the solver pauses every few hundred nodes even between solutions
+        time_end = time.perf_counter() + cfg.solve_time_slice
+        for solution in self.solutions_left:
+            if solution is not None:
+                self.solutions.append(solution)
+                if len(self.solutions) == 1:
+                    self.board.solution_line = solution
+                    self.add_top_panel()
+
+                if len(self.solutions) >= cfg.max_shown_solutions:
+                    # the count stays shown as incomplete
+                    self.solutions_left.close()
+                    self.solutions_left = None
+                    return
+
+            if time.perf_counter() > time_end:
+                return
+
+        self.solutions_left = None
+        self.solutions_complete = True
+        if not self.solutions:
+            self.window.popup.set('No solution found!')
 
     def on_key_press(self, symbol: int, modifiers: int):
         if self.is_selecting_lane_point() and symbol == arcade.key.ESCAPE:
@@ -142,12 +180,11 @@ class SolveView(arcade.View):
         elif symbol == arcade.key.SPACE:
             self.solve_puzzle()
         elif symbol == arcade.key.ENTER:
-            solutions = self.board.solve()
-            if not solutions:
-                self.window.popup.set('No solution, cannot copy code')
+            solution = self.get_solution('copy code')
+            if solution is None:
                 return
 
-            code = self.board.generate_code(solutions[0])
+            code = self.board.generate_code(solution)
             pyperclip.copy(code)
             self.window.popup.set('Puzzle code copied')
         elif symbol == arcade.key.R:
@@ -185,22 +222,31 @@ class SolveView(arcade.View):
         self.window.set_mouse_visible(True)
 
     def solve_puzzle(self, _event=None):
-        if not self.solutions:
-            solutions = self.board.solve()
-            if solutions:
-                self.solutions = solutions
-                self.board.solution_line = solutions[0]
-                self.add_top_panel()
+        if not self.solutions and self.solutions_left is None:
+            # solutions are collected frame by frame in on_update,
+            # the first one is shown as soon as it is found
+            self.solutions_left = self.board.iter_solutions(cfg.solve_pause_nodes)
+
+    def get_solution(self, action: str) -> Optional[FullPath]:
+        # the window waits for this one, so the search gets a node budget
+        # unless Solve has already found a solution
+        if self.solutions:
+            return self.solutions[0]
+
+        solution = self.board.first_solution(cfg.solve_max_nodes)
+        if solution is None:
+            if self.board.solver.gave_up:
+                self.window.popup.set(f'No solution found quickly, press Solve first to {action}')
             else:
-                self.window.popup.set('No solution found!')
+                self.window.popup.set(f'No solution, cannot {action}')
+        return solution
 
     def play_puzzle(self, _event=None):
-        solutions = self.board.solve()
-        if not solutions:
-            self.window.popup.set('Not solvable, cannot play this')
+        solution = self.get_solution('play this')
+        if solution is None:
             return
 
-        code = self.board.generate_code(solutions[0])
+        code = self.board.generate_code(solution)
         self.window.vm.show_play_view_with_custom_puzzle(code)
 
     def move_start(self, _event=None):
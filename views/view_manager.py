@@ -23,6 +23,12 @@ class ViewManager:
 
         return self.cached_views[name]
 
+    def close_views(self):
+        # the cached play view keeps generating puzzles in the background until stopped
+        for view in self.cached_views.values():
+            if isinstance(view, PlayView):
+                view.close()
+
     def show_menu_view(self):
         self.confirm_window_exists()
         menu_view = self.get_view_from_cache(MenuView)